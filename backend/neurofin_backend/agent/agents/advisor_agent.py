@@ -6,6 +6,8 @@ from agent.agents.forecast_agent import forecast_agent
 from agent.agents.classifier_agent import classifier_agent
 from agent.agents.risk_agent import risk_agent
 from agent.agents.llm import call_llm
+from agent.agents.request_context import request_context
+from agent.agents.fanout import fan_out
 
 from api.src.memory import (
     get_user_profile,
@@ -20,37 +22,40 @@ def advisor_agent(user_id: str, user_message: str) -> dict:
     NeuroFin Senior Advisor
     All sub-agents now use sandboxmonthlytransactions.
     advisor_agent combines memory + analytics + LLM summarization.
+    Sub-agents share one request context, so risk_agent reuses the
+    analyst/forecast results instead of recomputing them.
     """
+    with request_context() as ctx:
+        result = _advise(user_id, user_message)
 
-    # ------------------------------------------
-    # 1️⃣ Load persistent memory (ONLY these need fix_mongo_ids)
-    # ------------------------------------------
-    profile = fix_mongo_ids(get_user_profile(user_id))
-    goals = fix_mongo_ids(get_goals(user_id))
-    patterns = fix_mongo_ids(get_spending_pattern(user_id))
+    result["memo"] = ctx.stats()
+    return result
+
+
+def _advise(user_id: str, user_message: str) -> dict:
 
     # ------------------------------------------
+    # 1️⃣ Persistent memory (ONLY these need fix_mongo_ids)
     # 2️⃣ Sub-agents (DO NOT use fix_mongo_ids)
+    # All independent → fanned out on the shared pool
     # ------------------------------------------
-    try:
-        analyst = analyst_agent()
-    except:
-        analyst = {"error": "analyst_failed"}
-
-    try:
-        forecast = forecast_agent()
-    except:
-        forecast = {"error": "forecast_failed"}
-
-    try:
-        risk_eval = risk_agent()
-    except:
-        risk_eval = {"error": "risk_failed"}
-
-    try:
-        classifier_stats = classifier_agent()
-    except:
-        classifier_stats = {"error": "classifier_failed"}
+    results = fan_out({
+        "profile": (lambda: fix_mongo_ids(get_user_profile(user_id)), {"error": "profile_failed"}),
+        "goals": (lambda: fix_mongo_ids(get_goals(user_id)), {"error": "goals_failed"}),
+        "patterns": (lambda: fix_mongo_ids(get_spending_pattern(user_id)), {"error": "patterns_failed"}),
+        "analyst": (lambda: analyst_agent(user_id), {"error": "analyst_failed"}),
+        "forecast": (lambda: forecast_agent(user_id), {"error": "forecast_failed"}),
+        "risk": (lambda: risk_agent(user_id), {"error": "risk_failed"}),
+        "classifier": (lambda: classifier_agent(user_id), {"error": "classifier_failed"}),
+    })
+
+    profile = results["profile"]
+    goals = results["goals"]
+    patterns = results["patterns"]
+    analyst = results["analyst"]
+    forecast = results["forecast"]
+    risk_eval = results["risk"]
+    classifier_stats = results["classifier"]
 
     # ------------------------------------------
     # 3️⃣ Build final LLM prompt
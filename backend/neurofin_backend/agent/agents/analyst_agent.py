@@ -1,118 +1,91 @@
-from pymongo import MongoClient
 import numpy as np
-from datetime import datetime
+import re
 import os
 
-# -------------------------------------------------------
-# CONNECT TO SANDBOX COLLECTION
-# -------------------------------------------------------
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-db = MongoClient(MONGO_URI)["neurofin"]
-collection = db["sandboxmonthlytransactions"]
+from agent.agents.transaction_snapshot import (
+    get_snapshot,
+    sandbox_filter,
+    collection,
+    BASIC_RULES
+)
+from agent.agents.request_context import memoized_agent
+
+# "snapshot" → shared in-process frame, "pipeline" → MongoDB aggregation pushdown
+ANALYST_MODE = os.getenv("ANALYST_MODE", "snapshot").lower()
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
+EMPTY_RESULT = {
+    "total_spent": 0,
+    "daily_avg": 0,
+    "categories": {},
+    "top_spends": [],
+    "merchant_summary": {},
+    "weekly": {}
+}
+
+
+def empty_result(has_months):
+    # same summary in both modes, so ANALYST_MODE never changes the API output
+    return {
+        "summary": "No transaction entries" if has_months else "No data",
+        **EMPTY_RESULT
+    }
 
-def analyst_agent(user_id=None):
+
+@memoized_agent
+def analyst_agent(user_id=None, mode=None):
     """
     Correct Analyst Agent:
-    ✔ Reads nested monthly transaction schema:
+    ✔ Reads the shared columnar snapshot of:
         doc["months"]["January"] → [tx1, tx2, ...]
-    ✔ Flattens ALL transactions
+    ✔ Aggregates with vectorized groupbys
     ✔ Computes:
         - Total spent
         - Top categories
         - Weekly insights
         - Merchant spending
         - Daily averages
+    mode="pipeline" (or ANALYST_MODE) computes the same totals in MongoDB.
     """
 
-    doc = collection.find_one()
-
-    if not doc or "months" not in doc:
-        return {
-            "summary": "No data",
-            "total_spent": 0,
-            "daily_avg": 0,
-            "categories": {},
-            "top_spends": [],
-            "merchant_summary": {},
-            "weekly": {}
-        }
-
-    # Flatten all transactions
-    txs = []
-    for month, arr in doc["months"].items():
-        for t in arr:
-            txs.append(t)
-
-    if not txs:
-        return {
-            "summary": "No transaction entries",
-            "total_spent": 0,
-            "daily_avg": 0,
-            "categories": {},
-            "top_spends": [],
-            "merchant_summary": {},
-            "weekly": {}
-        }
+    if (mode or ANALYST_MODE) == "pipeline":
+        return analyst_pipeline(user_id)
+
+    snap = get_snapshot(user_id)
+
+    if snap.empty:
+        return empty_result(bool(snap.months))
+
+    # Debit = expense, Credit = income (ignored); unparseable timestamps skipped
+    frame = snap.frame
+    mask = ~snap.is_credit & frame["timestamp"].notna().to_numpy()
+
+    spend = frame["amount"].abs()[mask]
+    ts = frame["timestamp"][mask]
+
+    category_totals = spend.groupby(snap.category[mask], sort=False).sum().to_dict()
+    merchant_totals = spend.groupby(snap.merchant_or("Unknown")[mask], sort=False).sum().to_dict()
+    daily_totals = spend.groupby(ts.dt.normalize(), sort=False).sum().to_dict()
 
     # Weekly tracking
+    weekday_totals = spend.groupby(ts.dt.dayofweek).sum()
     weekly = {
-        "Mon": 0, "Tue": 0, "Wed": 0,
-        "Thu": 0, "Fri": 0, "Sat": 0, "Sun": 0
+        day: float(weekday_totals.get(i, 0))
+        for i, day in enumerate(WEEKDAYS)
     }
 
-    category_totals = {}
-    merchant_totals = {}
-    daily_totals = {}
-
-    for t in txs:
-        amount = float(t.get("amount", 0))
-        tx_type = str(t.get("type", "")).lower()
-
-        # Debit = expense, Credit = income (ignored)
-        if tx_type == "credit":
-            continue
-
-        amt = abs(amount)
-
-        merchant = t.get("merchant", "Unknown")
-        desc = (t.get("description") or "").lower()
-
-        # Category inference
-        if "food" in desc or "zomato" in merchant.lower() or "swiggy" in merchant.lower():
-            category = "Food"
-        elif "fuel" in desc or "petrol" in desc:
-            category = "Transport"
-        elif "amazon" in merchant.lower() or "flipkart" in merchant.lower():
-            category = "Shopping"
-        elif "rent" in desc:
-            category = "Housing"
-        else:
-            category = "General"
-
-        # Timestamp
-        ts_raw = t.get("timestamp")
-        try:
-            ts = datetime.fromisoformat(ts_raw.replace("Z", "").split("+")[0])
-        except:
-            continue
-
-        weekday = ts.strftime("%a")
-        date_key = ts.strftime("%Y-%m-%d")
-
-        # Accumulate totals
-        category_totals[category] = category_totals.get(category, 0) + amt
-        merchant_totals[merchant] = merchant_totals.get(merchant, 0) + amt
-        daily_totals[date_key] = daily_totals.get(date_key, 0) + amt
-        weekly[weekday] += amt
+    return _summarize(len(snap), category_totals, merchant_totals, daily_totals, weekly)
+
 
+def _summarize(tx_count, category_totals, merchant_totals, daily_totals, weekly):
     total_spent = sum(category_totals.values())
     daily_avg = float(np.mean(list(daily_totals.values()))) if daily_totals else 0
 
     top_spends = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)[:3]
 
     return {
-        "summary": f"Analyzed {len(txs)} transactions.",
+        "summary": f"Analyzed {tx_count} transactions.",
         "total_spent": round(total_spent, 2),
         "daily_avg": round(daily_avg, 2),
         "categories": {k: round(v, 2) for k, v in category_totals.items()},
@@ -122,3 +95,117 @@ def analyst_agent(user_id=None):
         "merchant_summary": {k: round(v, 2) for k, v in merchant_totals.items()},
         "weekly": {k: round(v, 2) for k, v in weekly.items()}
     }
+
+
+# -------------------------------------------------------
+# AGGREGATION PIPELINE MODE
+# -------------------------------------------------------
+def _keyword_match(field, words):
+    return {"$regexMatch": {"input": field, "regex": "|".join(re.escape(w) for w in words)}}
+
+
+def _category_switch(rules=BASIC_RULES):
+    branches = []
+    for name, desc_words, merchant_words in rules:
+        tests = []
+        if desc_words:
+            tests.append(_keyword_match("$desc_lc", desc_words))
+        if merchant_words:
+            tests.append(_keyword_match("$merchant_lc", merchant_words))
+        branches.append({"case": {"$or": tests}, "then": name})
+    return {"$switch": {"branches": branches, "default": "General"}}
+
+
+def _group_total(key):
+    return [
+        {"$match": {"spend": True}},
+        {"$group": {"_id": key, "total": {"$sum": "$amt"}}},
+        {"$sort": {"total": -1}}
+    ]
+
+
+def _wall_clock_ts(field):
+    """
+    Same reading as the snapshot: ISO strings lose a trailing 'Z' / UTC offset
+    and are bucketed on their wall-clock time; BSON dates are used as is.
+    """
+    return {"$cond": [
+        {"$eq": [{"$type": field}, "string"]},
+        {"$dateFromString": {
+            "dateString": {"$let": {
+                "vars": {"m": {"$regexFind": {"input": field, "regex": r"^(.*?)(?:Z|[+-]\d{2}:?\d{2})?$"}}},
+                "in": {"$arrayElemAt": ["$$m.captures", 0]}
+            }},
+            "onError": None,
+            "onNull": None
+        }},
+        {"$convert": {"input": field, "to": "date", "onError": None, "onNull": None}}
+    ]}
+
+
+def _match_stage(query):
+    # no query = the shared demo user (or a user without linked cards): the
+    # first sandbox doc, exactly what snapshot mode reads for them
+    return [{"$match": query}] if query is not None else [{"$limit": 1}]
+
+
+def build_analyst_pipeline(query=None):
+    """
+    One round trip: match the user's docs, flatten months with
+    $objectToArray/$unwind, and group category / merchant / day / weekday totals.
+    """
+    return _match_stage(query) + [
+        {"$project": {"_id": 0, "months": {"$objectToArray": {"$ifNull": ["$months", {}]}}}},
+        {"$unwind": "$months"},
+        {"$unwind": "$months.v"},
+        {"$replaceRoot": {"newRoot": "$months.v"}},
+        {"$set": {
+            "ts": _wall_clock_ts("$timestamp"),
+            "amt": {"$abs": {"$convert": {"input": "$amount", "to": "double", "onError": 0.0, "onNull": 0.0}}},
+            "merchant": {"$ifNull": ["$merchant", "Unknown"]},
+            "merchant_lc": {"$toLower": {"$ifNull": ["$merchant", "Unknown"]}},
+            "desc_lc": {"$toLower": {"$ifNull": ["$description", ""]}},
+        }},
+        # Debit = expense, Credit = income (ignored); unparseable timestamps skipped
+        {"$set": {
+            "spend": {"$and": [
+                {"$ne": ["$ts", None]},
+                {"$ne": [{"$toLower": {"$ifNull": ["$type", ""]}}, "credit"]}
+            ]},
+            "category": _category_switch()
+        }},
+        {"$facet": {
+            "count": [{"$count": "n"}],
+            "categories": _group_total("$category"),
+            "merchants": _group_total("$merchant"),
+            "daily": _group_total({"$dateToString": {"format": "%Y-%m-%d", "date": "$ts"}}),
+            "weekly": _group_total({"$isoDayOfWeek": "$ts"}),
+        }}
+    ]
+
+
+def _has_months(query):
+    """True if any matched doc has at least one month (entries or not)."""
+    rows = collection.aggregate(_match_stage(query) + [
+        {"$project": {"_id": 0, "n": {"$size": {"$objectToArray": {"$ifNull": ["$months", {}]}}}}},
+        {"$match": {"n": {"$gt": 0}}},
+        {"$limit": 1}
+    ])
+    return bool(list(rows))
+
+
+def analyst_pipeline(user_id=None):
+    query = sandbox_filter(user_id)
+    rows = list(collection.aggregate(build_analyst_pipeline(query)))
+    if not rows or not rows[0]["count"]:
+        return empty_result(_has_months(query))
+
+    tx_count = rows[0]["count"][0]["n"]
+
+    def totals(name):
+        return {r["_id"]: r["total"] for r in rows[0][name]}
+
+    weekday_totals = totals("weekly")     # ISO: 1 = Mon … 7 = Sun
+    weekly = {day: float(weekday_totals.get(i + 1, 0)) for i, day in enumerate(WEEKDAYS)}
+
+    return _summarize(tx_count, totals("categories"), totals("merchants"), totals("daily"), weekly)
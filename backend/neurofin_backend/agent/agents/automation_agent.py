@@ -1,51 +1,31 @@
-from pymongo import MongoClient
-import os
-from datetime import datetime
-from collections import defaultdict
-
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB = MongoClient(MONGO_URI)["neurofin"]
-collection = DB["sandboxmonthlytransactions"]
+from agent.agents.transaction_snapshot import get_snapshot, SPEND_RULES
+from agent.agents.request_context import memoized_agent
 
 
+@memoized_agent
 def automation_agent(user_id=None):
     """
     Updated Automation Agent:
-    ✔ Correctly flattens sandboxmonthlytransactions
+    ✔ Reads the shared sandboxmonthlytransactions snapshot
     ✔ Detects recurring merchants
     ✔ Detects salary credits
     ✔ Detects overspending categories
     ✔ Generates smart automation rules
     """
 
-    # Load single sandbox doc
-    doc = collection.find_one()
-    if not doc or "months" not in doc:
-        return {
-            "summary": "No transactions available.",
-            "rules": []
-        }
-
-    # Flatten all transactions
-    txs = []
-    for month, arr in doc["months"].items():
-        for t in arr:
-            txs.append(t)
-
-    if not txs:
+    snap = get_snapshot(user_id)
+    if snap.empty:
         return {"summary": "No transactions available.", "rules": []}
 
+    frame = snap.frame
+    credit = snap.is_credit
+
     # -----------------------------------------------------------
     # 1️⃣ Recurring merchants
     # -----------------------------------------------------------
-    merchant_freq = defaultdict(int)
-    for t in txs:
-        merchant = t.get("merchant", "Unknown")
-        merchant_freq[merchant] += 1
+    merchant_freq = snap.merchant_or("Unknown").value_counts(sort=False)
 
-    recurring_merchants = [
-        m for m, count in merchant_freq.items() if count >= 3
-    ]
+    recurring_merchants = merchant_freq[merchant_freq >= 3].index.tolist()
 
     recurring_rules = [
         {
@@ -59,10 +39,7 @@ def automation_agent(user_id=None):
     # -----------------------------------------------------------
     # 2️⃣ Salary detection
     # -----------------------------------------------------------
-    salary_detected = any(
-        t.get("type", "").lower() == "credit" and abs(float(t.get("amount", 0))) > 15000
-        for t in txs
-    )
+    salary_detected = bool((credit & (frame["amount"].abs() > 15000).to_numpy()).any())
 
     salary_rule = []
     if salary_detected:
@@ -75,25 +52,9 @@ def automation_agent(user_id=None):
     # -----------------------------------------------------------
     # 3️⃣ Category overspending
     # -----------------------------------------------------------
-    category_totals = defaultdict(float)
-    for t in txs:
-        if t.get("type", "").lower() == "credit":
-            continue
-
-        amt = abs(float(t.get("amount", 0)))
-        merchant = (t.get("merchant") or "").lower()
-        desc = (t.get("description") or "").lower()
-
-        if "food" in desc or "zomato" in merchant or "swiggy" in merchant:
-            cat = "Food"
-        elif "fuel" in desc or "petrol" in desc:
-            cat = "Transport"
-        elif "amazon" in merchant or "flipkart" in merchant:
-            cat = "Shopping"
-        else:
-            cat = "General"
-
-        category_totals[cat] += amt
+    category_totals = frame["amount"].abs()[~credit].groupby(
+        snap.categories(SPEND_RULES)[~credit], sort=False
+    ).sum().to_dict()
 
     top_category = max(category_totals, key=category_totals.get)
 
@@ -1,13 +1,5 @@
-from pymongo import MongoClient
-import os
-from collections import defaultdict
-
-# ----------------------------------------------------
-# CONNECT TO SANDBOX COLLECTION
-# ----------------------------------------------------
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-db = MongoClient(MONGO_URI)["neurofin"]
-collection = db["sandboxmonthlytransactions"]
+from agent.agents.transaction_snapshot import get_snapshot, CLASSIFIER_RULES
+from agent.agents.request_context import memoized_agent
 
 
 def classify(description: str, merchant: str = ""):
@@ -19,89 +11,55 @@ def classify(description: str, merchant: str = ""):
     desc = (description or "").lower()
     m = (merchant or "").lower()
 
-    # ---------------- Food ----------------
-    if any(w in desc for w in ["food", "restaurant", "cafe", "pizza", "burger", "meal"]) \
-       or any(w in m for w in ["zomato", "swiggy", "dominos", "kfc", "mcd"]):
-        return "Food"
-
-    # ---------------- Transport ----------------
-    if any(w in desc for w in ["uber", "ola", "auto", "train", "bus", "fuel", "petrol", "diesel"]) \
-       or any(w in m for w in ["uber", "ola", "rapido"]):
-        return "Transport"
-
-    # ---------------- Shopping ----------------
-    if any(w in desc for w in ["shopping", "store", "clothes", "shoes"]) \
-       or any(w in m for w in ["amazon", "flipkart", "myntra", "ajio"]):
-        return "Shopping"
-
-    # ---------------- Housing ----------------
-    if any(w in desc for w in ["rent", "flat", "apartment", "house", "maintenance"]):
-        return "Housing"
-
-    # ---------------- Health ----------------
-    if any(w in desc for w in ["pharmacy", "doctor", "hospital", "clinic", "medical"]):
-        return "Health"
+    # Food → Transport → Shopping → Housing → Health
+    for category, desc_words, merchant_words in CLASSIFIER_RULES:
+        if any(w in desc for w in desc_words) or any(w in m for w in merchant_words):
+            return category
 
     return "General"
 
 
 
+@memoized_agent
 def classifier_agent(user_id=None):
     """
     Correct Classifier Agent:
-    ✔ Flattens ALL monthly transactions
-    ✔ Detects categories
+    ✔ Reads the shared monthly transaction snapshot
+    ✔ Detects categories (vectorized over CLASSIFIER_RULES)
     ✔ Builds merchant → category mapping
     ✔ Returns clean “classified_transactions”
     """
 
-    doc = collection.find_one()
+    snap = get_snapshot(user_id)
 
-    if not doc or "months" not in doc:
+    if snap.empty:
         return {
-            "summary": "No data found.",
+            "summary": "No data found." if not snap.months else "No transactions available.",
             "categories": {},
             "merchant_categories": {},
             "classified_transactions": []
         }
 
-    # ---- Flatten monthly transactions ----
-    all_tx = []
-    for month, arr in doc["months"].items():
-        for t in arr:
-            all_tx.append(t)
+    debit = ~snap.is_credit    # skip income
+    frame = snap.frame[debit]
 
-    if not all_tx:
-        return {
-            "summary": "No transactions available.",
-            "categories": {},
-            "merchant_categories": {},
-            "classified_transactions": []
-        }
-
-    category_totals = defaultdict(float)
-    merchant_categories = {}
-    classified = []
-
-    for tx in all_tx:
-        amount = float(tx.get("amount", 0))
-        if tx.get("type", "").lower() == "credit":
-            continue  # skip income
+    merchants = frame["merchant"].fillna("")
+    descs = frame["description"].fillna("")
+    amounts = frame["amount"].abs()
+    cats = snap.categories(CLASSIFIER_RULES)[debit]
 
-        merchant = tx.get("merchant", "")
-        desc = tx.get("description", "")
+    category_totals = amounts.groupby(cats, sort=False).sum().to_dict()
+    merchant_categories = dict(zip(merchants, cats))
 
-        cat = classify(desc, merchant)
-
-        category_totals[cat] += abs(amount)
-        merchant_categories[merchant] = cat
-
-        classified.append({
-            "merchant": merchant,
-            "description": desc,
-            "amount": abs(amount),
-            "category": cat
-        })
+    classified = [
+        {
+            "merchant": m,
+            "description": d,
+            "amount": float(a),
+            "category": c
+        }
+        for m, d, a, c in zip(merchants, descs, amounts, cats)
+    ]
 
     return {
         "summary": "Classified all transactions successfully.",
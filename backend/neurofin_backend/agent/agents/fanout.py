@@ -0,0 +1,79 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# -------------------------------------------------------
+# SHARED BOUNDED POOL FOR INDEPENDENT SUB-AGENTS
+# -------------------------------------------------------
+# sized for a few concurrent requests (one advisor request fans out 7 tasks)
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "32"))
+FANOUT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "10"))
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+_stragglers = 0             # timed-out tasks still holding a worker
+_stragglers_lock = threading.Lock()
+
+
+class _Task:
+    def __init__(self, fn):
+        self.fn = fn
+        self.ctx = contextvars.copy_context()
+        self.started = threading.Event()
+        self.started_at = None
+
+    def run(self):
+        self.started_at = time.monotonic()
+        self.started.set()
+        return self.ctx.run(self.fn)
+
+
+def _straggler_done(_future):
+    global _stragglers
+    with _stragglers_lock:
+        _stragglers -= 1
+
+
+def fan_out(tasks: dict, timeout: float = None) -> dict:
+    """
+    Run independent calls in parallel and collect their results by name.
+
+    tasks: { name: (callable, fallback) }
+    ✔ Each callable runs with a copy of the caller's contextvars
+      (so the request memo from request_context() is shared)
+    ✔ A task that raises or runs longer than `timeout` yields its fallback;
+      the clock starts when the task starts, not while it waits for a worker
+    ✔ A task still queued after `timeout` is cancelled (never runs late and
+      never takes a worker from later requests)
+    """
+    global _stragglers
+    timeout = FANOUT_TIMEOUT if timeout is None else timeout
+    submitted_at = time.monotonic()
+
+    running = {}
+    for name, (fn, _) in tasks.items():
+        task = _Task(fn)
+        running[name] = (task, _executor.submit(task.run))
+
+    results = {}
+    for name, (task, future) in running.items():
+        fallback = tasks[name][1]
+        try:
+            if not task.started.wait(max(0.0, submitted_at + timeout - time.monotonic())) and future.cancel():
+                print(f"⚠ Fan-out task '{name}' waited {timeout}s for a worker, skipped")
+                results[name] = fallback
+                continue
+            task.started.wait()
+            results[name] = future.result(timeout=max(0.0, task.started_at + timeout - time.monotonic()))
+        except FutureTimeout:
+            with _stragglers_lock:
+                _stragglers += 1
+                busy = _stragglers
+            future.add_done_callback(_straggler_done)
+            print(f"⚠ Fan-out task '{name}' timed out after {timeout}s ({busy} stragglers still running)")
+            results[name] = fallback
+        except Exception as e:
+            print(f"⚠ Fan-out task '{name}' failed:", e)
+            results[name] = fallback
+    return results
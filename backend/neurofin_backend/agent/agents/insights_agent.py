@@ -1,22 +1,14 @@
 # agent/agents/insights_agent.py
 
-from agent.agents.forecast_agent import forecast_agent
+from agent.agents.trend_forecast import trend_forecast
 from agent.agents.savings_analyzer_agent import savings_analyzer_agent
 from agent.agents.investment_agent import investment_agent
 from agent.agents.analyst_agent import analyst_agent
 
-from pymongo import MongoClient
-import os
-
-# Mongo for investment_agent input
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB = MongoClient(MONGO_URI)["neurofin"]
-SANDBOX = DB["sandboxmonthlytransactions"]
-
 
 # ---------------- FORECAST INSIGHT ----------------
-def insights_from_forecast():
-    fore = forecast_agent()
+def insights_from_forecast(user_id=None):
+    fore = trend_forecast(user_id)
 
     trend = fore.get("trend", "STABLE")
     next_month = fore.get("next_month_total", 0)
@@ -47,7 +39,7 @@ def insights_from_forecast():
 
 # ---------------- SAVINGS INSIGHT ----------------
 def insights_from_savings(user_id=None):
-    sv = savings_analyzer_agent()  # updated, no user_id now
+    sv = savings_analyzer_agent(user_id)
     score = int(sv.get("savings_score", 50))
 
     impact = "High" if score < 40 else "Medium" if score < 70 else "Low"
@@ -71,9 +63,8 @@ def insights_from_savings(user_id=None):
 
 
 # ---------------- INVESTMENT INSIGHT ----------------
-def insights_from_investments():
-    # investment_agent expects a COLLECTION input
-    inv = investment_agent(SANDBOX)
+def insights_from_investments(user_id=None):
+    inv = investment_agent(user_id)
 
     risk = inv.get("risk_level", "LOW")
 
@@ -95,8 +86,8 @@ def insights_from_investments():
 
 
 # ---------------- SPENDING INSIGHT ----------------
-def insights_from_spending():
-    analysis = analyst_agent()
+def insights_from_spending(user_id=None):
+    analysis = analyst_agent(user_id)
     top = analysis.get("top_spends", [])
     cat = top[0]["category"] if top else "miscellaneous"
 
@@ -118,8 +109,8 @@ def insights_from_spending():
 # ---------------- MAIN ENTRY ----------------
 def insights_agent(user_id=None):
     return [
-        insights_from_forecast(),
-        insights_from_savings(),
-        insights_from_investments(),
-        insights_from_spending()
+        insights_from_forecast(user_id),
+        insights_from_savings(user_id),
+        insights_from_investments(user_id),
+        insights_from_spending(user_id)
     ]
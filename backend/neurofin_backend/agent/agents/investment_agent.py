@@ -1,34 +1,15 @@
-from collections import defaultdict
-import numpy as np
-from pymongo import MongoClient
-import os
-
-# -----------------------------
-# MONGO SETUP
-# -----------------------------
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB = MongoClient(MONGO_URI)["neurofin"]
-sandbox_collection = DB["sandboxmonthlytransactions"]
-
-
-def parse_ts(ts):
-    if isinstance(ts, dict) and "$date" in ts:
-        ts = ts["$date"]
-    try:
-        return ts
-    except:
-        return None
+from agent.agents.transaction_snapshot import get_snapshot
+from agent.agents.request_context import memoized_agent
 
 
 # -----------------------------
 # FIXED INVESTMENT AGENT
 # -----------------------------
+@memoized_agent
 def investment_agent(user_id=None):
     try:
-        collection = sandbox_collection
-
-        doc = collection.find_one()
-        if not doc or "months" not in doc:
+        snap = get_snapshot(user_id)
+        if not snap.months:
             return {
                 "summary": "No data",
                 "allocations": [],
@@ -38,24 +19,18 @@ def investment_agent(user_id=None):
                 "total_value": 0
             }
 
-        months = doc["months"]
-
-        category_totals = defaultdict(float)
-        monthly_totals = {}
-
         # -------------------------------------------
         # READ DATA SAFELY
         # -------------------------------------------
-        for month, arr in months.items():
-            monthly_sum = 0
-            for t in arr:
-                amt = float(t.get("amount", 0))
-                merchant = t.get("merchant", "Other")
+        amounts = snap.frame["amount"]
 
-                category_totals[merchant] += amt
-                monthly_sum += amt
+        category_totals = amounts.groupby(
+            snap.merchant_or("Other"), sort=False
+        ).sum().to_dict()
 
-            monthly_totals[month] = monthly_sum
+        monthly_totals = amounts.groupby(
+            snap.frame["month"], sort=False
+        ).sum().reindex(snap.months, fill_value=0).to_dict()
 
         total_value = sum(category_totals.values())
 
@@ -1,7 +1,13 @@
 import os
+import json
 import time
 import random
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+
+from .llm_cache import response_cache, cache_key, LLM_CACHE_ENABLED
+from .llm_limiter import limiter, estimate_tokens, RateLimitExceeded
 
 # --- config ---
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
@@ -9,100 +15,409 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
 
+SYSTEM_PROMPT = "You are NeuroFin AI assistant."
 
-def call_llm(prompt: str) -> str:
-    """
-    Universal LLM entry function.
-    Priority:
-    1. Groq (fast, free)
-    2. OpenAI (only if configured)
-    """
+# --- shared client policy (every call site goes through chat_completion) ---
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "300"))
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))    # seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
 
-    if LLM_PROVIDER == "groq":
-        return groq_llm(prompt)
-    else:
-        return openai_llm(prompt)
+# pass as max_tokens / temperature to leave the field out and use the provider's own default
+PROVIDER_DEFAULT = "provider-default"
+
+PROVIDERS = {
+    "groq": {
+        "label": "Groq",
+        "url": "https://api.groq.com/openai/v1/chat/completions",
+        "key": GROQ_API_KEY,
+        "key_name": "GROQ_API_KEY",
+    },
+    "openai": {
+        "label": "OpenAI",
+        "url": "https://api.openai.com/v1/responses",
+        "key": OPENAI_API_KEY,
+        "key_name": "OPENAI_API_KEY",
+    },
+}
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
 
 
 # -------------------------------------------------------
-#   GROQ LLaMA-3
+#   KEEP-ALIVE CONNECTION POOL
 # -------------------------------------------------------
-def groq_llm(prompt: str) -> str:
-    if not GROQ_API_KEY:
-        return "[Groq Error] GROQ_API_KEY missing."
+_session = None
+_session_lock = threading.Lock()
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
 
-    body = {
-        "model": MODEL,
-        "messages": [
-            {"role": "system", "content": "You are NeuroFin AI assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        "max_tokens": 300,
-        "temperature": 0.2
-    }
+def get_session() -> requests.Session:
+    """One process-wide Session → TCP/TLS connections are reused across calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=len(PROVIDERS), pool_maxsize=LLM_POOL_SIZE, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
 
+def _provider(name=None):
+    name = (name or LLM_PROVIDER).lower()
+    return name if name == "groq" else "openai"
+
+
+def _backoff(attempt, retry_after=None):
+    if retry_after:
+        return min(LLM_BACKOFF_MAX, retry_after)
+    # exponential backoff with full jitter
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(response):
     try:
-        r = requests.post(url, json=body, headers=headers, timeout=15)
-        r.raise_for_status()
-        data = r.json()
+        return float(response.headers.get("Retry-After") or 0)
+    except (TypeError, ValueError):
+        return 0
+
 
+def _build_body(provider, messages, model, max_tokens, temperature):
+    if provider == "groq":
         # Groq uses OpenAI ChatCompletion format
+        body = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+    else:
+        body = {
+            "model": model,
+            "input": messages,
+            "max_output_tokens": max_tokens,
+            "temperature": temperature
+        }
+    # None → field omitted (provider default)
+    return {k: v for k, v in body.items() if v is not None}
+
+
+def _parse(provider, data):
+    if provider == "groq":
         return data["choices"][0]["message"]["content"]
 
-    except Exception as e:
-        return f"[Groq Error] {str(e)}"
+    output_text = ""
+    for o in data.get("output", []):
+        for c in o.get("content", []):
+            if isinstance(c, dict) and "text" in c:
+                output_text += c["text"]
+    return (output_text or data.get("output_text") or "").strip()
 
 
 # -------------------------------------------------------
-#   OPENAI (used only during hackathon)
+#   IN-FLIGHT COALESCING (single-flight per cache key and priority)
 # -------------------------------------------------------
-def openai_llm(prompt: str) -> str:
-    if not OPENAI_API_KEY:
-        return "[OpenAI Error] OPENAI_API_KEY missing."
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}              # { (cache_key, priority): _InFlight }
+_inflight_lock = threading.Lock()
+_coalesce_counters = {"upstream": 0, "coalesced": 0}
+
+
+def _single_flight(key, fn, wait=None):
+    """
+    Concurrent identical requests share one upstream call and its outcome.
+    A follower gives up with LLMError after `wait` seconds (None = no limit).
+    """
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _InFlight()
+            _coalesce_counters["upstream"] += 1
+        else:
+            _coalesce_counters["coalesced"] += 1
+
+    if not leader:
+        if not call.done.wait(wait):
+            raise LLMError(f"identical in-flight request did not finish within {wait:.1f}s")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
 
-    url = "https://api.openai.com/v1/responses"
+def coalesce_stats():
+    with _inflight_lock:
+        return {**_coalesce_counters, "in_flight": len(_inflight)}
+
+
+def _send(provider, admit, timeout, retries, stream=False) -> requests.Response:
+    """
+    admit() waits for rate-limit budget and returns the request body.
+    A 429 blocks the shared bucket and goes back through admit() instead
+    of sleeping here; 5xx / connection errors use jittered backoff.
+    Returns the first 200 response.
+    """
+    cfg = PROVIDERS[provider]
     headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Authorization": f"Bearer {cfg['key']}",
         "Content-Type": "application/json"
     }
 
-    body = {
-        "model": MODEL,
-        "input": prompt,
-        "max_output_tokens": 350,
-        "temperature": 0.2
-    }
+    session = get_session()
+    last_error = "Unknown"
 
-    last_err = "Unknown"
-    for attempt in range(5):
+    for attempt in range(retries + 1):
+        body = admit()
         try:
-            r = requests.post(url, json=body, headers=headers, timeout=20)
+            r = session.post(cfg["url"], json=body, headers=headers, timeout=timeout, stream=stream)
+        except requests.RequestException as e:
+            last_error = str(e)
+        else:
+            if r.status_code == 200:
+                return r
 
-            # Rate limit
+            last_error = f"{r.status_code}: {r.text[:300]}"
+            r.close()
+            if r.status_code not in RETRYABLE_STATUS:
+                raise LLMError(last_error, status=r.status_code)
             if r.status_code == 429:
-                wait = (2 ** attempt) + random.random()
-                time.sleep(wait)
+                limiter.block_for(_backoff(attempt, _retry_after(r)))
+                continue
+
+        if attempt < retries:
+            time.sleep(_backoff(attempt))
+
+    raise LLMError(f"failed after {retries + 1} attempts: {last_error}")
+
+
+def _post(provider, admit, timeout, retries) -> str:
+    r = _send(provider, admit, timeout, retries)
+    try:
+        return _parse(provider, r.json())
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise LLMError(f"unparseable response: {e}")
+
+
+class _Request:
+    """Resolved parameters + rate-limit admission for one completion."""
+
+    def __init__(self, messages, model, max_tokens, temperature, provider, priority, cache, max_wait=None):
+        self.provider = _provider(provider)
+        cfg = PROVIDERS[self.provider]
+        if not cfg["key"]:
+            raise LLMError(f"{cfg['key_name']} missing.")
+
+        self.messages = messages
+        self.model = model or MODEL
+        # uncapped calls still reserve LLM_MAX_TOKENS from the limiter
+        self.capped = max_tokens != PROVIDER_DEFAULT
+        self.max_tokens = max_tokens if self.capped and max_tokens is not None else LLM_MAX_TOKENS
+        self.temperature = (
+            None if temperature == PROVIDER_DEFAULT
+            else LLM_TEMPERATURE if temperature is None else temperature
+        )
+        self.priority = priority
+        self.max_wait = max_wait
+        self.key = cache_key(self.provider, self.model, messages,
+                             self.max_tokens if self.capped else PROVIDER_DEFAULT, self.temperature)
+        self.use_cache = cache and LLM_CACHE_ENABLED
+        self.prompt_tokens = estimate_tokens(messages)
+        self.granted = self.max_tokens
+
+    def cached(self):
+        return response_cache.get(self.key) if self.use_cache else None
+
+    def admit(self, stream=False):
+        try:
+            self.granted = limiter.acquire(self.prompt_tokens, self.max_tokens, self.priority, self.max_wait)
+        except RateLimitExceeded as e:
+            raise LLMError(str(e), status=429)
+        # a degraded grant is always sent as a cap, even for uncapped calls
+        limit = self.granted if self.capped or self.granted < self.max_tokens else None
+        body = _build_body(self.provider, self.messages, self.model, limit, self.temperature)
+        if stream:
+            body["stream"] = True
+        return body
+
+    def store(self, text):
+        # degraded (shortened) answers are not worth keeping
+        if self.use_cache and self.granted == self.max_tokens:
+            response_cache.set(self.key, text)
+
+
+def chat_completion(messages, model=None, max_tokens=None, temperature=None,
+                    provider=None, timeout=None, max_retries=None, cache=True,
+                    priority="normal", max_wait=None) -> str:
+    """
+    Single pooled entry point for chat completions.
+    ✔ Response cache keyed by provider/model/messages/params (cache=False skips it)
+    ✔ Identical concurrent requests are coalesced into one upstream call
+    ✔ RPM/TPM token bucket shared through Redis; `priority` (high/normal/low)
+      decides whether a request queues, gets fewer max_tokens, or is shed
+    ✔ max_wait (seconds) caps the time spent queued for the rate limit or
+      waiting on a coalesced identical request
+    ✔ Shared keep-alive Session
+    ✔ Retries 429 / 5xx / connection errors with capped, jittered backoff
+      (Retry-After honoured)
+    ✔ Raises LLMError when the call ultimately fails
+    """
+    req = _Request(messages, model, max_tokens, temperature, provider, priority, cache, max_wait)
+    cached = req.cached()
+    if cached is not None:
+        return cached
+
+    def fetch():
+        text = _post(
+            req.provider,
+            req.admit,
+            timeout or (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT),
+            LLM_MAX_RETRIES if max_retries is None else max_retries
+        )
+        req.store(text)
+        return text
+
+    # per priority: a shed low-priority leader must not fail high-priority followers
+    return _single_flight((req.key, req.priority), fetch, max_wait)
+
+
+# -------------------------------------------------------
+#   STREAMING
+# -------------------------------------------------------
+def _stream_delta(provider, data):
+    if provider == "groq":
+        choices = data.get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content") or ""
+    if data.get("type") == "response.output_text.delta":
+        return data.get("delta") or ""
+    return ""
+
+
+def stream_chat_completion(messages, model=None, max_tokens=None, temperature=None,
+                           provider=None, timeout=None, max_retries=None, cache=True,
+                           priority="normal", max_wait=None):
+    """
+    Same policy as chat_completion(), but yields text deltas as the provider
+    streams them. A cached answer is yielded in one piece. Retries only
+    happen before the first byte; raises LLMError on failure.
+    """
+    req = _Request(messages, model, max_tokens, temperature, provider, priority, cache, max_wait)
+    cached = req.cached()
+    if cached is not None:
+        yield cached
+        return
+
+    r = _send(
+        req.provider,
+        lambda: req.admit(stream=True),
+        timeout or (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT),
+        LLM_MAX_RETRIES if max_retries is None else max_retries,
+        stream=True
+    )
+    r.encoding = "utf-8"
+
+    parts = []
+    complete = False
+    try:
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
                 continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                complete = True
+                break
+            try:
+                data = json.loads(payload)
+            except ValueError:
+                continue
+            if data.get("type") == "response.completed":
+                complete = True
+                break
+            delta = _stream_delta(req.provider, data)
+            if delta:
+                parts.append(delta)
+                yield delta
+    except requests.RequestException as e:
+        raise LLMError(f"stream interrupted: {e}")
+    finally:
+        r.close()
+
+    if complete:
+        req.store("".join(parts))
+
+
+def sse_event(event: str, data) -> str:
+    """Server-sent event frame (data is JSON-encoded)."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+def call_llm(prompt: str, system: str = SYSTEM_PROMPT, **kwargs) -> str:
+    """
+    Universal LLM entry function.
+    Priority:
+    1. Groq (fast, free)
+    2. OpenAI (only if configured)
+    Errors come back as text so agents can always render a reply.
+    """
+
+    label = PROVIDERS[_provider(kwargs.get("provider"))]["label"]
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+    try:
+        return chat_completion(messages, **kwargs)
+    except LLMError as e:
+        return f"[{label} Error] {e}"
+
 
-            r.raise_for_status()
-            data = r.json()
+def stream_llm(prompt: str, system: str = SYSTEM_PROMPT, **kwargs):
+    """
+    Streaming twin of call_llm(): yields text.
+    Failures raise LLMError (possibly after some text) so SSE routes can
+    send an error event instead of mixing it into the answer.
+    """
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+    yield from stream_chat_completion(messages, **kwargs)
 
-            # Extract the actual text
-            output_text = ""
-            for o in data.get("output", []):
-                for c in o.get("content", []):
-                    if isinstance(c, dict) and "text" in c:
-                        output_text += c["text"]
 
-            return output_text.strip() or "[OpenAI Warning] No output returned."
+# -------------------------------------------------------
+#   PROVIDER SHORTCUTS (kept for older imports)
+# -------------------------------------------------------
+def groq_llm(prompt: str) -> str:
+    return call_llm(prompt, provider="groq")
 
-        except Exception as e:
-            last_err = str(e)
 
-    return f"[OpenAI Error After Retries] {last_err}"
+def openai_llm(prompt: str) -> str:
+    return call_llm(prompt, provider="openai", max_tokens=350)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:     # shared tier is optional
+    redis = None
+
+# -------------------------------------------------------
+# LLM RESPONSE CACHE
+# (in-process LRU → shared Redis tier)
+# -------------------------------------------------------
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))             # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_SHARED = os.getenv("LLM_CACHE_SHARED", "1") == "1"
+LLM_CACHE_PREFIX = "llmcache:"
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+# After a Redis failure the shared tier is skipped for this long
+REDIS_RETRY_AFTER = 30.0
+
+
+def cache_key(provider, model, messages, max_tokens, temperature) -> str:
+    """Stable hash of everything that determines a completion."""
+    raw = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier completion cache:
+    ✔ LRU dict in this process (bounded by LLM_CACHE_MAX_ENTRIES)
+    ✔ Redis, shared by every api/agent process (SETEX with LLM_CACHE_TTL)
+    ✔ hit / miss counters per tier
+    Only successful completions are stored.
+    """
+
+    def __init__(self, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES, shared=LLM_CACHE_SHARED):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared and redis is not None
+        self._entries = OrderedDict()   # { key: (expires_at, text) }
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_down_until = 0.0
+        self.counters = {"memory_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0}
+
+    # ---------------- shared tier ----------------
+    def _client(self):
+        if not self.shared or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = redis.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                decode_responses=True,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5,
+            )
+        return self._redis
+
+    def _redis_failed(self, e):
+        print("⚠ LLM cache Redis tier unavailable:", e)
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    # ---------------- public API ----------------
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+
+        client = self._client()
+        if client is not None:
+            try:
+                text = client.get(LLM_CACHE_PREFIX + key)
+            except Exception as e:
+                self._redis_failed(e)
+                text = None
+            if text is not None:
+                self._remember(key, text)
+                self._count("shared_hits")
+                return text
+
+        self._count("misses")
+        return None
+
+    def set(self, key, text):
+        if not isinstance(text, str) or not text:
+            return
+        self._remember(key, text)
+        self._count("stores")
+
+        client = self._client()
+        if client is not None:
+            try:
+                client.setex(LLM_CACHE_PREFIX + key, self.ttl, text)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["shared_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+response_cache = LLMResponseCache()
+
+
+def llm_cache_stats():
+    return {"enabled": LLM_CACHE_ENABLED, **response_cache.stats()}
@@ -0,0 +1,270 @@
+import math
+import os
+import threading
+import time
+
+try:
+    import redis
+except ImportError:     # falls back to a per-process bucket
+    redis = None
+
+# -------------------------------------------------------
+# CLIENT-SIDE RATE LIMIT (requests/min + tokens/min)
+# -------------------------------------------------------
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "6000"))
+LLM_LIMIT_SHARED = os.getenv("LLM_LIMIT_SHARED", "1") == "1"
+LLM_LIMIT_KEY = os.getenv("LLM_LIMIT_KEY", "llmlimit:groq")
+LLM_MIN_COMPLETION_TOKENS = int(os.getenv("LLM_MIN_COMPLETION_TOKENS", "64"))
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_RETRY_AFTER = 30.0
+
+# priority → (max seconds to queue, may shrink max_tokens to fit)
+PRIORITIES = {
+    "high": (float(os.getenv("LLM_LIMIT_HIGH_WAIT", "15")), True),
+    "normal": (float(os.getenv("LLM_LIMIT_NORMAL_WAIT", "5")), True),
+    "low": (0.0, False),
+}
+_RANK = {"high": 0, "normal": 1, "low": 2}
+
+POLL_INTERVAL = 0.25
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(messages) -> int:
+    """~4 characters per token, plus a few per message for role framing."""
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return int(math.ceil(chars / 4)) + 4 * len(messages)
+
+
+# Both buckets refill continuously; one request costs 1 request + `need` tokens.
+# Returns {granted_tokens, wait_ms}; granted_tokens == 0 means "not yet".
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rpm = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local need = tonumber(ARGV[4])
+local minimum = tonumber(ARGV[5])
+
+local b = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts', 'blocked')
+local req = tonumber(b[1]) or rpm
+local tok = tonumber(b[2]) or tpm
+local ts = tonumber(b[3]) or now
+local blocked = tonumber(b[4]) or 0
+
+if now < blocked then
+  return {0, blocked - now}
+end
+
+local elapsed = math.max(0, now - ts) / 60000
+req = math.min(rpm, req + elapsed * rpm)
+tok = math.min(tpm, tok + elapsed * tpm)
+
+local granted = 0
+local wait = 0
+if req >= 1 and tok >= minimum then
+  granted = math.floor(math.min(need, tok))
+  req = req - 1
+  tok = tok - granted
+else
+  local wait_req = 0
+  local wait_tok = 0
+  if req < 1 then wait_req = (1 - req) / rpm * 60000 end
+  if tok < minimum then wait_tok = (minimum - tok) / tpm * 60000 end
+  wait = math.ceil(math.max(wait_req, wait_tok))
+end
+
+redis.call('HSET', KEYS[1], 'req', tostring(req), 'tok', tostring(tok), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], 120000)
+return {granted, wait}
+"""
+
+
+class TokenBucketLimiter:
+    """
+    RPM + TPM token buckets in front of the provider.
+    ✔ State lives in Redis (atomic Lua script) → shared by every thread,
+      worker and container; per-process bucket if Redis is unavailable
+    ✔ Waiters are served by priority inside a process (high → normal → low)
+    ✔ Per priority: queue up to a deadline, shrink max_tokens to fit the
+      remaining TPM budget (degrade), or shed immediately
+    ✔ A provider 429 blocks the shared bucket for Retry-After seconds
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, key=LLM_LIMIT_KEY, shared=LLM_LIMIT_SHARED):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.key = key
+        self.shared = shared and redis is not None
+        self._redis = None
+        self._script = None
+        self._redis_down_until = 0.0
+
+        self._lock = threading.Lock()
+        self._req = rpm
+        self._tok = tpm
+        self._ts = time.monotonic()
+        self._blocked_until = 0.0
+
+        self._waiting = [0, 0, 0]     # waiters per priority rank
+        self.counters = {"granted": 0, "queued": 0, "degraded": 0, "shed": 0}
+
+    # ---------------- bucket backends ----------------
+    def _client(self):
+        if not self.shared or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = redis.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5,
+            )
+            self._script = self._redis.register_script(_TAKE_SCRIPT)
+        return self._redis
+
+    def _redis_failed(self, e):
+        print("⚠ LLM limiter Redis unavailable, using local bucket:", e)
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    def _take_local(self, need, minimum):
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return 0, self._blocked_until - now
+
+            elapsed = (now - self._ts) / 60.0
+            self._ts = now
+            self._req = min(self.rpm, self._req + elapsed * self.rpm)
+            self._tok = min(self.tpm, self._tok + elapsed * self.tpm)
+
+            if self._req >= 1 and self._tok >= minimum:
+                granted = int(min(need, self._tok))
+                self._req -= 1
+                self._tok -= granted
+                return granted, 0.0
+
+            wait_req = (1 - self._req) / self.rpm * 60 if self._req < 1 else 0.0
+            wait_tok = (minimum - self._tok) / self.tpm * 60 if self._tok < minimum else 0.0
+            return 0, max(wait_req, wait_tok)
+
+    def _take(self, need, minimum):
+        client = self._client()
+        if client is not None:
+            try:
+                granted, wait_ms = self._script(
+                    keys=[self.key],
+                    args=[int(time.time() * 1000), self.rpm, self.tpm, need, minimum],
+                )
+                return int(granted), int(wait_ms) / 1000.0
+            except Exception as e:
+                self._redis_failed(e)
+        return self._take_local(need, minimum)
+
+    # ---------------- public API ----------------
+    def acquire(self, prompt_tokens: int, max_tokens: int, priority: str = "normal", max_wait=None) -> int:
+        """
+        Reserve budget for one call. Returns the max_tokens the call may use
+        (possibly reduced); raises RateLimitExceeded when the request is shed,
+        including a prompt too large to leave room for a usable completion.
+        max_wait (seconds) can only shorten the priority's queueing time.
+        """
+        priority = priority if priority in PRIORITIES else "normal"
+        priority_wait, may_degrade = PRIORITIES[priority]
+        max_wait = priority_wait if max_wait is None else max(0.0, min(priority_wait, max_wait))
+        rank = _RANK[priority]
+
+        smallest = min(max_tokens, LLM_MIN_COMPLETION_TOKENS) if may_degrade else max_tokens
+        if prompt_tokens + max(1, smallest) > self.tpm:
+            with self._lock:
+                self.counters["shed"] += 1
+            raise RateLimitExceeded(
+                f"LLM prompt too large (~{prompt_tokens} tokens) for the {int(self.tpm)} tokens/min limit"
+            )
+
+        need = min(prompt_tokens + max_tokens, self.tpm)
+        minimum = need
+        if may_degrade:
+            minimum = min(need, prompt_tokens + min(max_tokens, LLM_MIN_COMPLETION_TOKENS))
+
+        deadline = time.monotonic() + max_wait
+        queued = False
+        wait = 0.0
+
+        with self._lock:
+            self._waiting[rank] += 1
+        try:
+            while True:
+                with self._lock:
+                    outranked = any(self._waiting[r] for r in range(rank))
+
+                if not outranked:
+                    granted, wait = self._take(need, minimum)
+                    if granted:
+                        allowed = min(max_tokens, granted - prompt_tokens)
+                        if allowed < 1:         # unreachable after the size check; never send max_tokens=0
+                            with self._lock:
+                                self.counters["shed"] += 1
+                            raise RateLimitExceeded("LLM prompt leaves no room for a completion")
+                        with self._lock:
+                            self.counters["granted"] += 1
+                            if queued:
+                                self.counters["queued"] += 1
+                            if allowed < max_tokens:
+                                self.counters["degraded"] += 1
+                        return allowed
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (wait and wait > remaining and not outranked):
+                    with self._lock:
+                        self.counters["shed"] += 1
+                    raise RateLimitExceeded(
+                        f"LLM rate limit reached ({priority} priority request shed)",
+                        retry_after=wait,
+                    )
+
+                queued = True
+                time.sleep(min(POLL_INTERVAL, remaining, wait or POLL_INTERVAL))
+        finally:
+            with self._lock:
+                self._waiting[rank] -= 1
+
+    def block_for(self, seconds: float):
+        """Provider said 429 → every process holds off instead of retrying blindly."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+        client = self._client()
+        if client is not None:
+            try:
+                until = int((time.time() + seconds) * 1000)
+                client.hset(self.key, "blocked", until)
+                client.pexpire(self.key, 120000)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "waiting": sum(self._waiting),
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "shared": self.shared,
+            }
+
+
+limiter = TokenBucketLimiter()
+
+
+def limiter_stats():
+    return limiter.stats()
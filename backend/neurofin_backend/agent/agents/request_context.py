@@ -0,0 +1,99 @@
+import copy
+import inspect
+import contextvars
+import functools
+import threading
+from contextlib import contextmanager
+
+# -------------------------------------------------------
+# REQUEST-SCOPED SUB-AGENT MEMOIZATION
+# -------------------------------------------------------
+_current = contextvars.ContextVar("neurofin_request_context", default=None)
+
+
+class RequestContext:
+    """
+    Holds sub-agent results for the life of one request.
+    ✔ Each (agent, args) pair is computed at most once
+    ✔ Concurrent callers of the same key wait for the first computation
+    ✔ Counts how many recomputations were saved
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def memoize(self, key, compute):
+        with self._lock:
+            if key in self.results:
+                self.hits += 1
+                return self.results[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self.results:
+                    self.hits += 1
+                    return self.results[key]
+
+            value = compute()
+
+            with self._lock:
+                self.results[key] = value
+                self.misses += 1
+            return value
+
+    def stats(self):
+        return {"computed": self.misses, "saved": self.hits}
+
+
+def current_context():
+    return _current.get()
+
+
+@contextmanager
+def request_context():
+    """Open a memoization scope; nested scopes reuse the outer one."""
+    ctx = _current.get()
+    if ctx is not None:
+        yield ctx
+        return
+
+    ctx = RequestContext()
+    token = _current.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
+
+
+def memoized_agent(fn):
+    """
+    Decorator for sub-agents: inside a request_context() the result is
+    computed once for every caller with the same arguments; outside it is
+    a no-op.
+    ✔ f(uid) and f(user_id=uid) share one key (arguments bound to the signature)
+    ✔ each caller gets its own deep copy, so mutating a result is safe
+    """
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        ctx = _current.get()
+        if ctx is None:
+            return fn(*args, **kwargs)
+
+        try:
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (fn.__module__, fn.__qualname__, tuple(bound.arguments.items()))
+            hash(key)
+        except TypeError:
+            return fn(*args, **kwargs)
+
+        return copy.deepcopy(ctx.memoize(key, lambda: fn(*args, **kwargs)))
+
+    return wrapper
@@ -1,18 +1,10 @@
-from pymongo import MongoClient
-import os
-import numpy as np
-
 from agent.agents.forecast_agent import forecast_agent
 from agent.agents.analyst_agent import analyst_agent
 from api.src.memory import fix_mongo_ids
-
-# -------------------------------------------------------
-# CONNECT TO NEW SANDBOX COLLECTION
-# -------------------------------------------------------
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB = MongoClient(MONGO_URI)["neurofin"]
+from agent.agents.request_context import memoized_agent
 
 
+@memoized_agent
 def risk_agent(user_id=None):
     """
     Updated Risk Agent:
@@ -22,8 +14,8 @@ def risk_agent(user_id=None):
     ✔ Removes invalid runway_days reference
     """
 
-    analyst = analyst_agent()
-    forecast = forecast_agent()
+    analyst = analyst_agent(user_id)
+    forecast = forecast_agent(user_id)
 
     risk_score = 0
     issues = []
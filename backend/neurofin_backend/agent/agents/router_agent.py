@@ -1,20 +1,26 @@
+import os
+import time
+
 from agent.agents.analyst_agent import analyst_agent
 from agent.agents.forecast_agent import forecast_agent
 from agent.agents.classifier_agent import classifier_agent
 from agent.agents.risk_agent import risk_agent
-from agent.agents.llm import call_llm
+from agent.agents.llm import (
+    chat_completion, stream_chat_completion, LLMError,
+    SYSTEM_PROMPT, LLM_CONNECT_TIMEOUT
+)
+from agent.agents.router_templates import render_template
 from agent.agents.savings_analyzer_agent import savings_analyzer_agent
 from agent.agents.automation_agent import automation_agent
 from agent.agents.investment_agent import investment_agent
+from agent.agents.request_context import request_context
 
-from pymongo import MongoClient
-import os
-
-
-# ------- Investment needs collection passed manually -------
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB = MongoClient(MONGO_URI)["neurofin"]
-SANDBOX = DB["sandboxmonthlytransactions"]
+# "llm" → LLM writes the answer (template on failure); "fast" → template only
+ROUTER_MODE = os.getenv("ROUTER_MODE", "llm")
+# seconds for the whole request; 0 = no budget
+ROUTER_LATENCY_BUDGET = float(os.getenv("ROUTER_LATENCY_BUDGET", "0"))
+# below this much remaining budget the LLM is not even tried
+MIN_LLM_SECONDS = 0.5
 
 
 # ----------------------------------------------------
@@ -45,7 +51,99 @@ def detect_intent(message):
 # ----------------------------------------------------
 # ROUTER AGENT (FINAL OUTPUT-OPTIMIZED VERSION)
 # ----------------------------------------------------
-def router_agent(user_id, message):
+def router_agent(user_id, message, mode=None, budget=None):
+    """
+    Sub-agent results are memoized for this request, so e.g. risk_agent
+    reuses the analyst/forecast output of the WEEKLY_SUMMARY path.
+
+    mode="fast" renders the answer from the agent data without the LLM;
+    `budget` (seconds) does the same when the sub-agents used it up, and
+    the template is also the fallback when the LLM fails.
+    """
+    started = time.monotonic()
+    with request_context() as ctx:
+        plan = plan_route(user_id, message)
+        llm_kwargs = _llm_options(mode, budget, started)
+
+        answer, source = None, "template"
+        if llm_kwargs is not None:
+            try:
+                answer = chat_completion(_messages(plan["prompt"]), **llm_kwargs)
+                source = "llm"
+            except LLMError as e:
+                print("⚠ Router LLM unavailable, using template:", e)
+        if answer is None:
+            answer = render_template(plan["intent"], plan["data"])
+
+    return {"answer": answer, "source": source, "memo": ctx.stats()}
+
+
+def router_agent_stream(user_id, message, mode=None, budget=None):
+    """
+    Streaming variant: returns (plan, text generator).
+    Sub-agents run before this returns; only the LLM part is streamed.
+    plan["source"] is final once the generator is exhausted. An LLM failure
+    before the first token falls back to the template; after it, LLMError
+    propagates so the route can report a truncated answer.
+    """
+    started = time.monotonic()
+    with request_context() as ctx:
+        plan = plan_route(user_id, message)
+
+    plan["memo"] = ctx.stats()
+    plan["source"] = "template"
+    llm_kwargs = _llm_options(mode, budget, started)
+
+    def tokens():
+        if llm_kwargs is not None:
+            sent = False
+            try:
+                for text in stream_chat_completion(_messages(plan["prompt"]), **llm_kwargs):
+                    sent = True
+                    plan["source"] = "llm"
+                    yield text
+                return
+            except LLMError as e:
+                print("⚠ Router LLM stream failed:", e)
+                if sent:
+                    raise
+        yield render_template(plan["intent"], plan["data"])
+
+    return plan, tokens()
+
+
+def _messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _llm_options(mode, budget, started):
+    """chat_completion kwargs for this request, or None when the template must be used."""
+    if (mode or ROUTER_MODE).lower() == "fast":
+        return None
+
+    budget = ROUTER_LATENCY_BUDGET if budget is None else float(budget)
+    if not budget:
+        return {}
+
+    remaining = budget - (time.monotonic() - started)
+    if remaining < MIN_LLM_SECONDS:
+        return None
+    # the budget also bounds queueing for the rate limit / a coalesced call
+    return {
+        "timeout": (min(LLM_CONNECT_TIMEOUT, remaining), remaining),
+        "max_retries": 0,
+        "max_wait": remaining - MIN_LLM_SECONDS,
+    }
+
+
+def plan_route(user_id, message):
+    """
+    Detect the intent, run its sub-agents and build the LLM prompt.
+    Returns { intent, data, prompt }.
+    """
 
     intent = detect_intent(message)
 
@@ -53,7 +151,7 @@ def router_agent(user_id, message):
     #         FORECAST
     # ============================
     if intent == "FORECAST":
-        data = forecast_agent()
+        data = forecast_agent(user_id)
 
         prompt = f"""
 You MUST respond in clean plain text.
@@ -80,7 +178,7 @@ Here is the forecast data:
 {data}
 """
 
-        return {"answer": call_llm(prompt)}
+        return {"intent": intent, "data": data, "prompt": prompt}
 
 
 
@@ -88,7 +186,7 @@ Here is the forecast data:
     #     SPENDING ANALYSIS
     # ============================
     if intent == "ANALYZE_SPENDING":
-        data = analyst_agent()
+        data = analyst_agent(user_id)
 
         prompt = f"""
 You MUST output clean plain text.
@@ -114,7 +212,7 @@ Here is the spending data:
 {data}
 """
 
-        return {"answer": call_llm(prompt)}
+        return {"intent": intent, "data": data, "prompt": prompt}
 
 
 
@@ -122,7 +220,7 @@ Here is the spending data:
     #     SAVINGS ANALYSIS
     # ============================
     if intent == "ANALYZE_SAVINGS":
-        data = savings_analyzer_agent()
+        data = savings_analyzer_agent(user_id)
 
         prompt = f"""
 Return a clean financial summary.
@@ -154,7 +252,7 @@ Here is the savings data:
 {data}
 """
 
-        return {"answer": call_llm(prompt)}
+        return {"intent": intent, "data": data, "prompt": prompt}
 
 
 
@@ -162,7 +260,7 @@ Here is the savings data:
     #     INVESTMENT ADVICE
     # ============================
     if intent == "INVESTMENT_ADVICE":
-        data = investment_agent(SANDBOX)
+        data = investment_agent(user_id)
 
         prompt = f"""
 Generate clean investment advice.
@@ -197,7 +295,7 @@ Here is the data:
 {data}
 """
 
-        return {"answer": call_llm(prompt)}
+        return {"intent": intent, "data": data, "prompt": prompt}
 
 
 
@@ -205,7 +303,7 @@ Here is the data:
     #         RISK CHECK
     # ============================
     if intent == "RISK_CHECK":
-        data = risk_agent()
+        data = risk_agent(user_id)
 
         prompt = f"""
 Provide a clean risk summary.
@@ -233,16 +331,16 @@ Here is the risk data:
 {data}
 """
 
-        return {"answer": call_llm(prompt)}
+        return {"intent": intent, "data": data, "prompt": prompt}
 
 
 
     # ============================
     #     WEEKLY SUMMARY (DEFAULT)
     # ============================
-    analyst_data = analyst_agent()
-    risk_data = risk_agent()
-    forecast_data = forecast_agent()
+    analyst_data = analyst_agent(user_id)
+    risk_data = risk_agent(user_id)
+    forecast_data = forecast_agent(user_id)
 
     summary_prompt = f"""
 Generate a weekly summary.
@@ -275,4 +373,8 @@ Forecast:
 {forecast_data}
 """
 
-    return {"answer": call_llm(summary_prompt)}
+    return {
+        "intent": intent,
+        "data": {"spending": analyst_data, "risk": risk_data, "forecast": forecast_data},
+        "prompt": summary_prompt
+    }
@@ -0,0 +1,294 @@
+# agent/agents/router_templates.py
+"""
+Deterministic renderers for the router_agent intents.
+Each one fills the same plain-text layout the LLM prompt asks for,
+straight from the sub-agent output (no network, no randomness).
+"""
+
+
+def _inr(value):
+    try:
+        return f"₹{float(value):,.0f}"
+    except (TypeError, ValueError):
+        return "₹0"
+
+
+def _num(data, key, default=0.0):
+    try:
+        return float((data or {}).get(key, default) or 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def _bullets(items):
+    return "\n".join(f"• {item}" for item in items)
+
+
+def _numbered(items):
+    return "\n".join(f"{i}. {item}" for i, item in enumerate(items, 1))
+
+
+def _pad(items, fillers, n):
+    out = list(items)[:n]
+    for f in fillers:
+        if len(out) >= n:
+            break
+        if f not in out:
+            out.append(f)
+    return out
+
+
+def _level(score):
+    return "HIGH" if score >= 70 else "MODERATE" if score >= 40 else "LOW"
+
+
+# ----------------------------------------------------
+# FORECAST
+# ----------------------------------------------------
+def render_forecast(data):
+    trend = (data or {}).get("trend", "STABLE")
+    next_month = _num(data, "next_month_total")
+
+    risks = []
+    if trend == "UPWARD":
+        risks.append("Daily spending is rising, so next month may run above your usual budget.")
+    if next_month > 60000:
+        risks.append(f"A projected {_inr(next_month)} is unusually high for one month.")
+    risks = _pad(risks, [
+        "One off large purchases can push the projection up quickly.",
+        "Recurring bills and subscriptions add up if they are not reviewed.",
+    ], 2)
+
+    if trend == "UPWARD":
+        action = f"Set a monthly cap of {_inr(next_month * 0.9)} and track it weekly."
+    elif trend == "DOWNWARD":
+        action = "Move the money you are saving into a recurring deposit or SIP."
+    else:
+        action = f"Keep spending near {_inr(next_month)} and review it at month end."
+
+    return (
+        "30 Day Forecast\n"
+        f"{_bullets([f'Trend: {trend}', f'Projected Spending: {_inr(next_month)}'])}\n\n"
+        "Risks\n"
+        f"{_numbered(risks)}\n\n"
+        "Recommendation\n"
+        f"{_bullets([action])}"
+    )
+
+
+# ----------------------------------------------------
+# SPENDING ANALYSIS
+# ----------------------------------------------------
+def spending_score(data):
+    return int(min(100, _num(data, "daily_avg") / 2500 * 70))
+
+
+def render_spending(data):
+    data = data or {}
+    total = _num(data, "total_spent")
+    daily_avg = _num(data, "daily_avg")
+    top = data.get("top_spends") or []
+    weekly = data.get("weekly") or {}
+
+    insights = [
+        f"You spent {_inr(total)} in total.",
+        f"Your average daily spend is {_inr(daily_avg)}.",
+    ]
+    if top and total > 0:
+        first = top[0]
+        share = first.get("total", 0) / total * 100
+        insights.append(f"{first.get('category')} is your largest category at {_inr(first.get('total'))} ({share:.0f}%).")
+    if any(weekly.values()):
+        busiest = max(weekly, key=weekly.get)
+        insights.append(f"{busiest} is your highest spending day of the week.")
+    insights = _pad(insights, [
+        "Most of your spending is spread across a few categories.",
+        "Tracking weekly totals makes overspending easier to catch.",
+    ], 4)
+
+    improvements = [
+        f"Set a monthly cap for {t.get('category')} (currently {_inr(t.get('total'))})."
+        for t in top
+    ]
+    improvements = _pad(improvements, [
+        "Review subscriptions and cancel the ones you do not use.",
+        "Plan big purchases a week ahead instead of buying on impulse.",
+        "Keep a weekly spending limit and check it every Sunday.",
+    ], 3)
+
+    score = spending_score(data)
+
+    return (
+        "Spending Insights\n"
+        f"{_bullets(insights)}\n\n"
+        "Improvements\n"
+        f"{_numbered(improvements)}\n\n"
+        "Spending Risk Score\n"
+        f"{_bullets([f'{score}/100 ({_level(score)})'])}"
+    )
+
+
+# ----------------------------------------------------
+# SAVINGS ANALYSIS
+# ----------------------------------------------------
+def render_savings(data):
+    data = data or {}
+    income = _num(data, "income")
+    expenses = _num(data, "expenses")
+    net = _num(data, "net_savings")
+    rate = _num(data, "savings_rate")
+    score = int(_num(data, "savings_score", 50))
+
+    ideal = 0.2 * (income if income > 0 else expenses)
+    gap = max(0.0, ideal - net)
+
+    drains = data.get("drains") or []
+    issues = [f"{d.get('category')}: {_inr(d.get('total'))}" for d in drains[:3]]
+    issues_text = _numbered(issues) if issues else _bullets(["No major spending drains found."])
+
+    tips = [f"Cut {d.get('category')} spending by 10% next month." for d in drains[:2]]
+    tips = _pad(tips, [
+        "Automate a transfer to savings on salary day.",
+        "Increase your SIP amount by 10%.",
+        "Review recurring expenses once a month.",
+    ], 3)
+
+    return (
+        "Savings Health\n"
+        f"{_bullets([f'Score: {score}/100', f'Net Savings: {_inr(net)}', f'Savings Rate: {rate:g}%'])}\n\n"
+        "Ideal Savings\n"
+        f"{_bullets([f'Suggested Target: {_inr(ideal)}', f'Gap From Target: {_inr(gap)}'])}\n\n"
+        "Top Issues\n"
+        f"{issues_text}\n\n"
+        "Improvement Plan\n"
+        f"{_bullets(tips)}"
+    )
+
+
+# ----------------------------------------------------
+# INVESTMENT ADVICE
+# ----------------------------------------------------
+ALLOCATIONS = {
+    "LOW": ("Equity funds: 60%", "Debt funds: 30%", "Gold: 10%"),
+    "MEDIUM": ("Equity funds: 50%", "Debt funds: 40%", "Gold: 10%"),
+    "HIGH": ("Equity funds: 35%", "Debt funds: 50%", "Gold and liquid funds: 15%"),
+}
+
+SAFE_OPTIONS = ("Public Provident Fund (PPF)", "Bank fixed deposits", "Short duration debt funds")
+GROWTH_OPTIONS = ("Nifty 50 index fund", "Flexi cap mutual fund", "ELSS tax saver fund")
+
+
+def render_investment(data):
+    data = data or {}
+    risk = data.get("risk_level", "LOW")
+    total = _num(data, "total_value")
+
+    if risk == "HIGH":
+        tip = "Shift part of your equity exposure into debt funds to lower volatility."
+    elif risk == "MEDIUM":
+        tip = "Keep a monthly SIP running and rebalance once a year."
+    else:
+        tip = "Start or raise a monthly SIP in an index fund to grow long term wealth."
+
+    return (
+        "Investment Overview\n"
+        f"{_bullets([f'Total Value: {_inr(total)}', f'Risk Level: {risk}'])}\n\n"
+        "Ideal Allocation\n"
+        f"{_numbered(ALLOCATIONS.get(risk, ALLOCATIONS['LOW']))}\n\n"
+        "Safe Options\n"
+        f"{_bullets(SAFE_OPTIONS)}\n\n"
+        "Growth Options\n"
+        f"{_bullets(GROWTH_OPTIONS)}\n\n"
+        "Recommendation\n"
+        f"{_bullets([tip])}"
+    )
+
+
+# ----------------------------------------------------
+# RISK CHECK
+# ----------------------------------------------------
+RISK_FIXES = (
+    ("daily", "Set a daily spending limit and track it in the app."),
+    ("disproportionately", "Cap your largest category at 30% of total spending."),
+    ("rising", "Freeze non essential purchases until the trend flattens."),
+    ("projected", "Build next month's budget around fixed bills first."),
+)
+
+GENERIC_FIXES = (
+    "Keep an emergency fund of three months of expenses.",
+    "Review your spending every week.",
+    "Automate savings on salary day.",
+)
+
+
+def _fixes(issues):
+    fixes = [fix for word, fix in RISK_FIXES if any(word in i for i in issues)]
+    return _pad(fixes, GENERIC_FIXES, 3)
+
+
+def render_risk(data):
+    data = data or {}
+    level = data.get("risk_level", "LOW")
+    score = int(_num(data, "risk_score"))
+    issues = data.get("issues") or []
+
+    risks = _pad(issues, [
+        "No major risk signals in your recent transactions.",
+        "Unplanned expenses could still strain your budget.",
+        "Income changes would affect your savings buffer.",
+    ], 3)
+
+    return (
+        "Risk Level\n"
+        f"{_bullets([level])}\n\n"
+        "Major Risks\n"
+        f"{_numbered(risks)}\n\n"
+        "Stability Probability\n"
+        f"{_bullets([f'{max(0, 100 - score)}%'])}\n\n"
+        "Fixes\n"
+        f"{_bullets(_fixes(issues))}"
+    )
+
+
+# ----------------------------------------------------
+# WEEKLY SUMMARY
+# ----------------------------------------------------
+def render_weekly(data):
+    data = data or {}
+    spending = data.get("spending") or {}
+    risk = data.get("risk") or {}
+    forecast = data.get("forecast") or {}
+
+    top = spending.get("top_spends") or []
+    insights = [
+        f"You spent {_inr(spending.get('total_spent'))}, about {_inr(spending.get('daily_avg'))} a day.",
+        f"Spending trend is {forecast.get('trend', 'STABLE').lower()}, heading for {_inr(forecast.get('next_month_total'))} next month.",
+    ]
+    if top:
+        insights.append(f"{top[0].get('category')} was your biggest category at {_inr(top[0].get('total'))}.")
+    insights = _pad(insights, [f"Risk level is {risk.get('risk_level', 'LOW')}."], 3)
+
+    score = max(0, 100 - int(_num(risk, "risk_score")))
+
+    return (
+        "Weekly Insights\n"
+        f"{_bullets(insights)}\n\n"
+        "Financial Score\n"
+        f"{_bullets([f'{score}/100'])}\n\n"
+        "Fixes For Next Week\n"
+        f"{_numbered(_fixes(risk.get('issues') or []))}"
+    )
+
+
+RENDERERS = {
+    "FORECAST": render_forecast,
+    "ANALYZE_SPENDING": render_spending,
+    "ANALYZE_SAVINGS": render_savings,
+    "INVESTMENT_ADVICE": render_investment,
+    "RISK_CHECK": render_risk,
+    "WEEKLY_SUMMARY": render_weekly,
+}
+
+
+def render_template(intent, data):
+    return RENDERERS.get(intent, render_weekly)(data)
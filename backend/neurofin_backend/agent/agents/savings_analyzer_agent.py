@@ -1,37 +1,13 @@
-from pymongo import MongoClient
-import os
-from collections import defaultdict
-from datetime import datetime
-import numpy as np
 from api.src.memory import fix_mongo_ids
-
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB = MongoClient(MONGO_URI)["neurofin"]
-
-sandbox = DB["sandboxmonthlytransactions"]
-
-
-def infer_category(desc: str, merchant: str = ""):
-    desc = (desc or "").lower()
-    merchant = (merchant or "").lower()
-
-    if "food" in desc or "zomato" in merchant or "swiggy" in merchant:
-        return "Food"
-    if "fuel" in desc or "petrol" in desc:
-        return "Transport"
-    if "amazon" in merchant or "flipkart" in merchant:
-        return "Shopping"
-    if "rent" in desc:
-        return "Housing"
-    if "medical" in desc or "pharmacy" in desc:
-        return "Health"
-    return "General"
+from agent.agents.transaction_snapshot import get_snapshot, HEALTH_RULES
+from agent.agents.request_context import memoized_agent
 
 
+@memoized_agent
 def savings_analyzer_agent(user_id=None):
-    doc = sandbox.find_one()
+    snap = get_snapshot(user_id)
 
-    if not doc or "months" not in doc:
+    if snap.empty:
         return {
             "summary": "No data",
             "income": 0,
@@ -41,24 +17,14 @@ def savings_analyzer_agent(user_id=None):
             "drains": []
         }
 
-    income = 0
-    expenses = 0
-    category_totals = defaultdict(float)
-
-    # Flatten month data
-    for month, arr in doc["months"].items():
-        for t in arr:
-            amt = float(t.get("amount", 0))
-            tx_type = (t.get("type") or "").lower()
-            merchant = t.get("merchant", "")
-            desc = t.get("description", "")
+    credit = snap.is_credit
+    amounts = snap.frame["amount"].abs()
 
-            if tx_type == "credit":      # income
-                income += abs(amt)
-            else:                        # expense
-                expenses += abs(amt)
-                category = infer_category(desc, merchant)
-                category_totals[category] += abs(amt)
+    income = float(amounts[credit].sum())       # income
+    expenses = float(amounts[~credit].sum())    # expense
+    category_totals = amounts[~credit].groupby(
+        snap.categories(HEALTH_RULES)[~credit], sort=False
+    ).sum().to_dict()
 
     net_savings = income - expenses
 
@@ -0,0 +1,306 @@
+from pymongo import MongoClient
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import time
+import re
+import os
+
+import numpy as np
+import pandas as pd
+
+from agent.agents.request_context import current_context
+
+# -------------------------------------------------------
+# CONNECT TO SANDBOX COLLECTION
+# -------------------------------------------------------
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB = MongoClient(MONGO_URI)["neurofin"]
+collection = DB["sandboxmonthlytransactions"]
+cards = DB["cards"]
+
+# Upper bound on snapshot age, for docs without an updatedAt stamp
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL", "300"))
+SNAPSHOT_MAX_USERS = int(os.getenv("SNAPSHOT_MAX_USERS", "256"))
+
+
+# -------------------------------------------------------
+# CATEGORY RULE SETS
+# (category, description keywords, merchant keywords)
+# -------------------------------------------------------
+BASIC_RULES = (
+    ("Food", ("food",), ("zomato", "swiggy")),
+    ("Transport", ("fuel", "petrol"), ()),
+    ("Shopping", (), ("amazon", "flipkart")),
+    ("Housing", ("rent",), ()),
+)
+
+HEALTH_RULES = BASIC_RULES + (
+    ("Health", ("medical", "pharmacy"), ()),
+)
+
+SPEND_RULES = BASIC_RULES[:3]
+
+CLASSIFIER_RULES = (
+    ("Food",
+     ("food", "restaurant", "cafe", "pizza", "burger", "meal"),
+     ("zomato", "swiggy", "dominos", "kfc", "mcd")),
+    ("Transport",
+     ("uber", "ola", "auto", "train", "bus", "fuel", "petrol", "diesel"),
+     ("uber", "ola", "rapido")),
+    ("Shopping",
+     ("shopping", "store", "clothes", "shoes"),
+     ("amazon", "flipkart", "myntra", "ajio")),
+    ("Housing",
+     ("rent", "flat", "apartment", "house", "maintenance"),
+     ()),
+    ("Health",
+     ("pharmacy", "doctor", "hospital", "clinic", "medical"),
+     ()),
+)
+
+
+def _contains_any(values: pd.Series, words) -> np.ndarray:
+    if not words:
+        return np.zeros(len(values), dtype=bool)
+    pattern = "|".join(re.escape(w) for w in words)
+    return values.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+
+
+class TransactionSnapshot:
+    """
+    Columnar view of one user's sandboxmonthlytransactions:
+    ✔ doc["months"] flattened exactly once
+    ✔ timestamp / amount / type / merchant / description / month columns
+    ✔ derived category per rule set, computed lazily and cached
+    """
+
+    def __init__(self, frame: pd.DataFrame, months: list, version):
+        self.frame = frame
+        self.months = months
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    @property
+    def is_credit(self) -> np.ndarray:
+        return (self.frame["type"] == "credit").to_numpy()
+
+    def merchant_or(self, default: str) -> pd.Series:
+        return self.frame["merchant"].fillna(default)
+
+    def categories(self, rules=BASIC_RULES) -> pd.Series:
+        """Vectorized keyword categorization (first matching rule wins)."""
+        with self._lock:
+            cached = self._categories.get(rules)
+        if cached is not None:
+            return cached
+
+        desc = self.frame["description"].fillna("").str.lower()
+        merchant = self.frame["merchant"].fillna("").str.lower()
+
+        conditions = [
+            _contains_any(desc, d_words) | _contains_any(merchant, m_words)
+            for _, d_words, m_words in rules
+        ]
+        choices = [name for name, _, _ in rules]
+        cats = pd.Series(
+            np.select(conditions, choices, default="General") if len(self.frame) else [],
+            index=self.frame.index,
+            dtype=object
+        )
+
+        with self._lock:
+            self._categories[rules] = cats
+        return cats
+
+    @property
+    def category(self) -> pd.Series:
+        return self.categories(BASIC_RULES)
+
+
+# -------------------------------------------------------
+# LOADING
+# -------------------------------------------------------
+def _normalize_ts(raw):
+    if isinstance(raw, dict) and "$date" in raw:
+        raw = raw["$date"]
+    if isinstance(raw, datetime):
+        return raw.replace(tzinfo=None)
+    return None if raw is None else str(raw)
+
+
+def _parse_timestamps(raw: list) -> pd.Series:
+    """Wall-clock timestamps: trailing 'Z' / UTC offsets are dropped, bad values → NaT."""
+    s = pd.Series(raw, dtype=object)
+    is_dt = s.map(lambda v: isinstance(v, datetime)).to_numpy(dtype=bool)
+
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    if is_dt.any():
+        out[is_dt] = pd.to_datetime(s[is_dt].tolist()).to_numpy()
+    text_mask = ~is_dt & s.notna().to_numpy()
+    if text_mask.any():
+        text = s[text_mask].astype(str).str.replace(r"(Z|[+-]\d{2}:?\d{2})$", "", regex=True)
+        out[text_mask] = pd.to_datetime(text, errors="coerce", format="ISO8601").to_numpy()
+    return out
+
+
+def build_snapshot(docs: list) -> TransactionSnapshot:
+    ts, amount, tx_type, merchant, desc, month = [], [], [], [], [], []
+    months = []
+
+    for doc in docs:
+        for m, arr in (doc.get("months") or {}).items():
+            if m not in months:
+                months.append(m)
+            for t in arr:
+                ts.append(_normalize_ts(t.get("timestamp")))
+                amount.append(t.get("amount") or 0)
+                tx_type.append(t.get("type"))
+                merchant.append(t.get("merchant"))
+                desc.append(t.get("description"))
+                month.append(m)
+
+    frame = pd.DataFrame({
+        "timestamp": _parse_timestamps(ts),
+        "amount": pd.to_numeric(pd.Series(amount, dtype=object), errors="coerce").fillna(0.0).astype(float),
+        "type": pd.Series(tx_type, dtype=object).fillna("").astype(str).str.lower(),
+        "merchant": pd.Series(merchant, dtype=object),
+        "description": pd.Series(desc, dtype=object),
+        "month": pd.Series(month, dtype=object),
+    })
+
+    version = tuple((str(d.get("_id")), d.get("updatedAt")) for d in docs)
+    return TransactionSnapshot(frame, months, version)
+
+
+_indexes_ready = False
+
+
+def ensure_indexes():
+    """Compound indexes backing the per-user lookups (created once per process)."""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    try:
+        cards.create_index([("userId", 1), ("number", 1)])
+        collection.create_index([("cardNumber", 1), ("updatedAt", -1)])
+    except Exception as e:
+        print("⚠ Index creation failed:", e)
+    _indexes_ready = True
+
+
+def _per_request(name, user_id, compute):
+    """Inside a request_context(), compute once per (name, user_id) for the whole request."""
+    ctx = current_context()
+    if ctx is None or not isinstance(user_id, (str, type(None))):
+        return compute()
+    return ctx.memoize((__name__, name, user_id), compute)
+
+
+def sandbox_filter(user_id=None):
+    """
+    Mongo filter for the sandbox docs owned by user_id.
+    Returns None for the shared demo user (and users without linked cards),
+    which keeps the original single-document behaviour.
+    The card lookup runs once per request.
+    """
+    if not user_id or not isinstance(user_id, str) or user_id == "sandbox":
+        return None
+    return _per_request("sandbox_filter", user_id, lambda: _card_filter(user_id))
+
+
+def _card_filter(user_id):
+    ensure_indexes()
+
+    numbers = [
+        c["number"].replace(" ", "")
+        for c in cards.find({"userId": user_id}, {"number": 1})
+        if c.get("number")
+    ]
+    if not numbers:
+        return None
+    return {"cardNumber": {"$in": numbers}}
+
+
+def _fetch_version(query):
+    if query is None:
+        doc = collection.find_one({}, {"updatedAt": 1})
+        docs = [doc] if doc else []
+    else:
+        docs = list(collection.find(query, {"updatedAt": 1}))
+    return tuple((str(d.get("_id")), d.get("updatedAt")) for d in docs)
+
+
+def _fetch_docs(query):
+    if query is None:
+        doc = collection.find_one()
+        return [doc] if doc else []
+    return list(collection.find(query))
+
+
+# -------------------------------------------------------
+# SHARED CACHE
+# -------------------------------------------------------
+_cache = OrderedDict()      # { cache_key: TransactionSnapshot }
+_load_locks = {}            # { cache_key: Lock } → one loader per user at a time
+_cache_lock = threading.Lock()
+
+
+def get_snapshot(user_id=None) -> TransactionSnapshot:
+    """
+    Shared snapshot used by every analytics agent.
+    Reloaded only when the docs' updatedAt version changes or the TTL expires;
+    inside a request_context() the version is checked once per request.
+    """
+    return _per_request("snapshot", user_id, lambda: _load_snapshot(user_id))
+
+
+def _load_snapshot(user_id):
+    query = sandbox_filter(user_id)
+    key = repr(query)
+
+    with _cache_lock:
+        snap = _cache.get(key)
+
+    if snap is not None and time.monotonic() - snap.loaded_at < SNAPSHOT_TTL:
+        if snap.version == _fetch_version(query):
+            with _cache_lock:
+                _cache.move_to_end(key)
+            return snap
+
+    with _cache_lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Concurrent agents of one request wait for a single load
+    with load_lock:
+        with _cache_lock:
+            fresh = _cache.get(key)
+        if fresh is not None and fresh is not snap:
+            return fresh
+
+        snap = build_snapshot(_fetch_docs(query))
+
+        with _cache_lock:
+            _cache[key] = snap
+            _cache.move_to_end(key)
+            while len(_cache) > SNAPSHOT_MAX_USERS:
+                evicted, _ = _cache.popitem(last=False)
+                _load_locks.pop(evicted, None)
+    return snap
+
+
+def invalidate_snapshot(user_id=None):
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(repr(sandbox_filter(user_id)), None)
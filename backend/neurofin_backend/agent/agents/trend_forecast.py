@@ -0,0 +1,85 @@
+import threading
+import weakref
+
+import numpy as np
+
+from agent.agents.transaction_snapshot import get_snapshot
+
+# -------------------------------------------------------
+# SHARED LINEAR-TREND SPENDING FORECAST
+# used by forecast_agent, insights_from_forecast and /forecast/run
+# -------------------------------------------------------
+PROJECTION_DAYS = 30
+
+_results = weakref.WeakKeyDictionary()      # { TransactionSnapshot: forecast dict }
+_results_lock = threading.Lock()
+
+
+def daily_totals(snap):
+    """(dates 'YYYY-MM-DD', totals) of absolute amounts per calendar day, sorted."""
+    ts = snap.frame["timestamp"]
+    valid = ts.notna().to_numpy()
+    if not valid.any():
+        return np.array([], dtype="<U10"), np.array([])
+
+    days = ts[valid].to_numpy().astype("datetime64[D]")
+    uniq, idx = np.unique(days, return_inverse=True)
+    totals = np.bincount(idx, weights=np.abs(snap.frame["amount"].to_numpy(dtype=float)[valid]))
+    return np.datetime_as_string(uniq, unit="D"), totals
+
+
+def linear_trend(y: np.ndarray):
+    """Closed-form least-squares (slope, intercept) of y over x = 0..n-1."""
+    n = len(y)
+    if n < 2:
+        return 0.0, float(y[0]) if n else 0.0
+    x_mean = (n - 1) / 2
+    x_var = (n * n - 1) / 12                         # variance of 0..n-1
+    slope = float(np.mean((np.arange(n) - x_mean) * (y - y.mean())) / x_var)
+    return slope, float(y.mean() - slope * x_mean)
+
+
+def project(last: float, slope: float, days: int = PROJECTION_DAYS) -> float:
+    """Σ_{i<days} (last + slope·i), without the loop."""
+    return days * last + slope * days * (days - 1) / 2
+
+
+def compute_forecast(snap) -> dict:
+    if not snap.months:
+        return {"summary": "no data"}
+
+    dates, y = daily_totals(snap)
+    if not len(y):
+        return {"summary": "no valid timestamps"}
+
+    slope, _ = linear_trend(y)
+    next_month = project(y[-1], slope)
+
+    return {
+        "summary": "ok",
+        "next_month_total": round(float(next_month), 2),
+        "three_month_projection": round(float(next_month * 3), 2),
+        "year_projection": round(float(next_month * 12), 2),
+        "five_year_projection": round(float(next_month * 60), 2),
+        "ten_year_projection": round(float(next_month * 120), 2),
+        "trend": "UPWARD" if slope > 0 else "DOWNWARD" if slope < 0 else "STABLE",
+        "daily_points": [{"date": d, "value": float(v)} for d, v in zip(dates.tolist(), y)]
+    }
+
+
+def trend_forecast(user_id=None) -> dict:
+    """
+    Spending forecast for one user's sandbox data.
+    ✔ Reads the shared per-user snapshot (no collection scans)
+    ✔ Cached per snapshot, i.e. recomputed only when the data version changes
+    """
+    snap = get_snapshot(user_id)
+    with _results_lock:
+        cached = _results.get(snap)
+    if cached is not None:
+        return cached
+
+    result = compute_forecast(snap)
+    with _results_lock:
+        _results[snap] = result
+    return result
@@ -9,6 +9,14 @@ from flask import Flask, request, jsonify
 import requests
 import re
 from respond import bp as respond_bp
+try:
+    from agent.agents.llm import chat_completion, LLMError, coalesce_stats
+    from agent.agents.llm_cache import llm_cache_stats
+    from agent.agents.llm_limiter import limiter_stats
+except ImportError:
+    from agents.llm import chat_completion, LLMError, coalesce_stats
+    from agents.llm_cache import llm_cache_stats
+    from agents.llm_limiter import limiter_stats
 
 # --- logging ---
 logger = logging.getLogger("langgraph_agent")
@@ -162,10 +170,8 @@ Be concise and conservative.
 
 def call_openai_node(state: MessagesState):
     """
-    Groq Llama-3.x node for LangGraph.
+    Groq Llama-3.x node for LangGraph (shared pooled LLM client).
     """
-    import requests, time, random, json
-
     prompt = state.context.get("prompt")
     if not prompt:
         return {"error": "no prompt"}
@@ -173,63 +179,28 @@ def call_openai_node(state: MessagesState):
     if not GROQ_API_KEY:
         return {"error": "groq_key_missing"}
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    payload = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "system", "content": "You are NeuroFin AI Assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        "max_tokens": 500,
-        "temperature": 0.4,
-    }
-
-    max_attempts = 5
-    attempt = 0
-    last_error = None
-
-    while attempt < max_attempts:
-        attempt += 1
-        try:
-            r = requests.post(url, json=payload, headers=headers, timeout=20)
-
-            if r.status_code == 200:
-                data = r.json()
-                try:
-                    text = data["choices"][0]["message"]["content"]
-                except:
-                    return {"error": "groq_parse_failed"}
-
-                # Extract JSON from LLM output (your helper)
-                parsed = extract_json_from_text(text)
-                if parsed is None:
-                    parsed = {"raw": text.strip()}
-
-                state.context["llm_advice"] = parsed
-                return {"ok": True}
-
-            if r.status_code == 429:
-                time.sleep(1 + random.random())
-                continue
-
-            if 500 <= r.status_code < 600:
-                time.sleep(1 + random.random())
-                continue
-
-            last_error = f"{r.status_code}: {r.text[:500]}"
-            break
-
-        except Exception as e:
-            last_error = str(e)
-            time.sleep(1)
-            continue
-
-    return {"error": f"groq_failed_after_retries: {last_error}"}
+    try:
+        text = chat_completion(
+            [
+                {"role": "system", "content": "You are NeuroFin AI Assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            provider="groq",
+            model=GROQ_MODEL,
+            max_tokens=500,
+            temperature=0.4,
+            priority="high",
+        )
+    except LLMError as e:
+        return {"error": f"groq_failed_after_retries: {e}"}
+
+    # Extract JSON from LLM output (your helper)
+    parsed = extract_json_from_text(text)
+    if parsed is None:
+        parsed = {"raw": text.strip()}
+
+    state.context["llm_advice"] = parsed
+    return {"ok": True}
 
 
 
@@ -439,7 +410,10 @@ def agent_respond():
 def health():
     return jsonify({
         "status": "ok",
-        "groq_key_present": bool(GROQ_API_KEY)
+        "groq_key_present": bool(GROQ_API_KEY),
+        "llm_cache": llm_cache_stats(),
+        "llm_coalescing": coalesce_stats(),
+        "llm_rate_limit": limiter_stats()
     })
 
 if __name__ == "__main__":
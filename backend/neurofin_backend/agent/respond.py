@@ -2,11 +2,17 @@
 import os
 import json
 import importlib
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# shared pooled LLM client (agent/ is the working dir inside the container)
+try:
+    from agent.agents.llm import chat_completion, stream_chat_completion, sse_event, LLMError
+except ImportError:
+    from agents.llm import chat_completion, stream_chat_completion, sse_event, LLMError
+
 bp = Blueprint("respond_bp", __name__)
 
 # -----------------------
@@ -20,71 +26,39 @@ def call_risk_agent(uid, ctx):
 
 def call_llm(prompt):
     """
-    Groq Llama-3.x completion with robust safety and fallback.
+    Groq Llama-3.x completion through the shared pooled LLM client.
     """
-
-    import os, time, random, requests, json
-
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-    if not GROQ_API_KEY:
-        return "Groq key missing. Set GROQ_API_KEY in environment."
-
-    model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    payload = {
-        "model": model,
-        "messages": [
+    try:
+        return chat_completion(
+            [
+                {"role": "system", "content": "You are NeuroFin AI Assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            provider="groq",
+            model=os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
+            temperature=0.4,
+            max_tokens=512,
+            priority="high",
+        )
+    except LLMError as e:
+        return f"Groq LLM failed after retries: {e}"
+
+def stream_llm(prompt):
+    """
+    Same completion as call_llm, streamed token by token.
+    LLMError propagates so stream_answer can send it as an error event.
+    """
+    yield from stream_chat_completion(
+        [
             {"role": "system", "content": "You are NeuroFin AI Assistant."},
             {"role": "user", "content": prompt}
         ],
-        "temperature": 0.4,
-        "max_tokens": 512,
-    }
-
-    # Retry loop like your OpenAI version
-    max_attempts = 5
-    attempt = 0
-    last_error = None
-
-    while attempt < max_attempts:
-        attempt += 1
-        try:
-            r = requests.post(url, json=payload, headers=headers, timeout=20)
-
-            if r.status_code == 200:
-                data = r.json()
-                try:
-                    return data["choices"][0]["message"]["content"]
-                except:
-                    return json.dumps(data)[:2000]
-
-            # Handle rate limit (Groq returns 429)
-            if r.status_code == 429:
-                sleep_time = 1 + random.random() * 2
-                time.sleep(sleep_time)
-                continue
-
-            if 500 <= r.status_code < 600:
-                # server error retry
-                time.sleep(1 + random.random())
-                continue
-
-            # Other errors → break
-            last_error = f"{r.status_code}: {r.text}"
-            break
-
-        except Exception as e:
-            last_error = str(e)
-            time.sleep(1)
-            continue
-
-    return f"Groq LLM failed after retries: {last_error}"
+        provider="groq",
+        model=os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
+        temperature=0.4,
+        max_tokens=512,
+        priority="high",
+    )
 
 
 
@@ -120,18 +94,11 @@ except Exception:
     def rag_retrieve(user_id, k=5):
         return []
 
-# -----------------------
-# Blueprint handler
-# -----------------------
-@bp.route("/agent/respond", methods=["POST"])
-def respond():
-    payload = request.json or {}
-    user_id = payload.get("user_id")
-    # support both "question" and "input" keys
-    question = payload.get("question") or payload.get("input") or payload.get("text")
-    if not user_id or not question:
-        return jsonify({"error":"missing user_id or question"}), 400
-
+def build_answer_context(user_id, question):
+    """
+    Gather context, risk and RAG results for one question.
+    Returns (prompt, risk, retrieved).
+    """
     # ensure langgraph_agent helpers are loaded (avoids circular import at module load)
     _ensure_langgraph_agent_loaded()
 
@@ -179,6 +146,46 @@ Risk agent output:
 Provide a concise, empathetic financial explanation.
 If risk severity is medium or high, include a two-step actionable suggestion.
 """
+    return prompt, risk, retrieved
+
+
+def stream_answer(user_id, question):
+    """
+    SSE: token events as they arrive, then a done event with risk + retrieved_count.
+    Any failure (LLM included, even mid-answer) ends the stream with an error event.
+    """
+    partial = False
+    try:
+        prompt, risk, retrieved = build_answer_context(user_id, question)
+        for text in stream_llm(prompt):
+            partial = True
+            yield sse_event("token", {"text": text})
+        yield sse_event("done", {"risk": risk, "retrieved_count": len(retrieved)})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e), "partial": partial})
+
+
+# -----------------------
+# Blueprint handler
+# -----------------------
+@bp.route("/agent/respond", methods=["POST"])
+def respond():
+    payload = request.json or {}
+    user_id = payload.get("user_id")
+    # support both "question" and "input" keys
+    question = payload.get("question") or payload.get("input") or payload.get("text")
+    if not user_id or not question:
+        return jsonify({"error":"missing user_id or question"}), 400
+
+    # streaming mode (server-sent events)
+    if payload.get("stream") or "text/event-stream" in request.headers.get("Accept", ""):
+        return Response(
+            stream_with_context(stream_answer(user_id, question)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    prompt, risk, retrieved = build_answer_context(user_id, question)
 
     # 5) call the LLM
     try:
@@ -25,6 +25,9 @@ from api.src.routes.forecast_route import bp_forecast
 from api.src.routes.investment_route import bp_investment
 from api.src.routes.insights_route import bp_insights
 from api.src.routes.ask_route import bp_ask
+from agent.agents.llm_cache import llm_cache_stats
+from agent.agents.llm import coalesce_stats
+from agent.agents.llm_limiter import limiter_stats
 
 # ------------------------------------
 # Initialize Flask
@@ -56,7 +59,7 @@ app.register_blueprint(bp_ask,          url_prefix="/api")
 # ------------------------------------
 @app.route("/health")
 def health():
-    return jsonify({"status": "ok"}), 200
+    return jsonify({"status": "ok", "llm_cache": llm_cache_stats(), "llm_coalescing": coalesce_stats(), "llm_rate_limit": limiter_stats()}), 200
 
 # ------------------------------------
 # Route Viewer (for debugging)
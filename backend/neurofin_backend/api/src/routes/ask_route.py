@@ -1,23 +1,79 @@
 # api/src/routes/ask_route.py
 
-from flask import Blueprint, request, jsonify
-from agent.agents.router_agent import router_agent
+import math
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from agent.agents.router_agent import router_agent, router_agent_stream
+from agent.agents.llm import sse_event
 
 bp_ask = Blueprint("bp_ask", __name__)
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def wants_stream(data):
+    """Stream when the body says so or the client asks for text/event-stream."""
+    return bool(data.get("stream")) or "text/event-stream" in request.headers.get("Accept", "")
+
+
+def parse_budget(value):
+    """latency_budget in seconds (None = server default); ValueError when not a number >= 0."""
+    if value is None:
+        return None
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("latency_budget must be a number of seconds")
+    if not math.isfinite(budget) or budget < 0:
+        raise ValueError("latency_budget must be a number of seconds")
+    return budget
+
+
+def stream_reply(user_id, message, mode=None, budget=None):
+    """
+    SSE: token events as the LLM produces them, then one done event with metadata.
+    A failure ends the stream with an error event instead; partial=True means
+    tokens were already sent (the answer is truncated).
+    """
+    partial = False
+    try:
+        plan, tokens = router_agent_stream(user_id, message, mode=mode, budget=budget)
+        for text in tokens:
+            partial = True
+            yield sse_event("token", {"text": text})
+        yield sse_event("done", {"intent": plan["intent"], "source": plan["source"], "memo": plan["memo"]})
+
+    except Exception as e:
+        print("❌ ERROR in ask_route stream:", e)
+        yield sse_event("error", {"error": str(e), "partial": partial})
+
+
 @bp_ask.route("/ask", methods=["POST"])
 def ask():
     try:
         data = request.json or {}
         user_id = data.get("user_id", "sandbox")
         message = data.get("message", "")
+        mode = data.get("mode")                       # "fast" → no LLM
 
         if not message:
             return jsonify({"error": "Message is required"}), 400
 
+        try:
+            budget = parse_budget(data.get("latency_budget"))     # seconds
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         print("🧠 Incoming Chat:", message)
 
-        result = router_agent(user_id, message)
+        if wants_stream(data):
+            return Response(
+                stream_with_context(stream_reply(user_id, message, mode, budget)),
+                mimetype="text/event-stream",
+                headers=SSE_HEADERS
+            )
+
+        result = router_agent(user_id, message, mode=mode, budget=budget)
 
         # Router always returns dict
         # Example: { "answer": "your final reply" }
@@ -27,7 +83,7 @@ def ask():
         if not isinstance(reply_text, str):
             reply_text = str(reply_text)
 
-        return jsonify({"reply": reply_text}), 200
+        return jsonify({"reply": reply_text, "source": result.get("source")}), 200
 
     except Exception as e:
         print("❌ ERROR in ask_route:", e)
@@ -1,11 +1,21 @@
 import { Router } from "express";
 import { CanonicalTransaction } from "../types";
 import Redis from "ioredis";
+import { createHash } from "crypto";
 import { getDb } from "../db";
 
 const router = Router();
 const redis = new Redis({ host: process.env.REDIS_HOST || "127.0.0.1", port: Number(process.env.REDIS_PORT || 6379) });
 
+// Kalman events go to transactions_stream:{shard}; must match shard_of() in kalman/kalman_service.py
+const KALMAN_SHARDS = Number(process.env.KALMAN_SHARDS || 8);
+const STREAM_MAXLEN = Number(process.env.KALMAN_STREAM_MAXLEN || 1000000);
+
+function kalmanStream(userId: string): string {
+  const shard = parseInt(createHash("md5").update(userId).digest("hex").slice(0, 8), 16) % KALMAN_SHARDS;
+  return `transactions_stream:${shard}`;
+}
+
 router.post("/batch", async (req, res) => {
   try {
     const body = req.body;
@@ -39,15 +49,18 @@ router.post("/batch", async (req, res) => {
 
     const insertRes = await coll.insertMany(docs);
 
+    // one round trip for the whole batch; XADD keeps per-user order within a shard
+    const pipeline = redis.pipeline();
     for (const doc of docs) {
-      const payload = {
-        user_id: doc.user_id,
-        ts: doc.ts.toISOString(),
-        amount: doc.amount,
-        direction: doc.direction
-      };
-      await redis.rpush("transactions_queue", JSON.stringify(payload));
+      pipeline.xadd(
+        kalmanStream(doc.user_id), "MAXLEN", "~", String(STREAM_MAXLEN), "*",
+        "user_id", doc.user_id,
+        "ts", doc.ts.toISOString(),
+        "amount", String(doc.amount),
+        "direction", doc.direction
+      );
     }
+    await pipeline.exec();
 
     return res.status(202).json({ status: "queued", count: docs.length, insertedCount: insertRes.insertedCount });
   } catch (err: any) {
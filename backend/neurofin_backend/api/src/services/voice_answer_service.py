@@ -1,8 +1,5 @@
-import requests
-import os
 from conversation_memory import get_history, add_to_history
-
-GROQ_KEY = os.getenv("GROQ_API_KEY")
+from agent.agents.llm import chat_completion, PROVIDER_DEFAULT
 
 def generate_voice_answer(user_id, question):
     
@@ -14,17 +11,15 @@ def generate_voice_answer(user_id, question):
         {"role": "user", "content": question}
     ]
 
-    # 3️⃣ Call Groq Chat Completion
-    groq_res = requests.post(
-        "https://api.groq.com/openai/v1/chat/completions",
-        headers={"Authorization": f"Bearer {GROQ_KEY}"},
-        json={
-            "model": "llama-3.1-8b-instant",
-            "messages": messages
-        }
-    ).json()
-
-    answer = groq_res["choices"][0]["message"]["content"]
+    # 3️⃣ Call Groq Chat Completion (shared pooled client)
+    answer = chat_completion(
+        messages,
+        provider="groq",
+        model="llama-3.1-8b-instant",
+        max_tokens=PROVIDER_DEFAULT,      # voice answers were never capped
+        temperature=PROVIDER_DEFAULT,
+        priority="high"
+    )
 
     # 4️⃣ Save new messages to memory
     add_to_history(user_id, "user", question)
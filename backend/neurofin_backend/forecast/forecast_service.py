@@ -1,20 +1,24 @@
 # forecast_service.py
 import os
 import json
+import weakref
 from datetime import datetime, timedelta
 from typing import List, Dict
 
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from flask import Flask, jsonify, request
 from pymongo import MongoClient
 from dateutil import parser as dateparser
 
-# tensorflow imports
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense
-from tensorflow.keras.callbacks import EarlyStopping
+# tensorflow is loaded lazily (tf_runtime) — only training and the keras engine need it
+import tf_runtime
+from model_registry import ModelRegistry
+from lstm_numpy import extract_weights, lstm_forward, rollout
+from stat_models import ets_forecast
+from global_model import GLOBAL_KEY, GLOBAL_MODEL_NAME, build_training_set, predict_batch
+import jobs
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongodb:27017")
 MONGO_DB = os.getenv("MONGO_DB", "neurofin")
@@ -24,63 +28,114 @@ db = client[MONGO_DB]
 
 app = Flask(__name__)
 
+# -------------------------------------------------------
+# DAILY NET FLOW (aggregated in Mongo, one row per user-day)
+# -------------------------------------------------------
+AGG_BATCH_SIZE = int(os.getenv("FORECAST_AGG_BATCH_SIZE", "5000"))
+
+def _daily_net_rows(match: dict, by_user: bool = False):
+    """
+    Stream {_id: day | {u, d}, net} rows: debits are signed negative
+    ($cond on direction, missing direction = credit) and summed per day
+    server-side, so only one small row per day leaves Mongo.
+    """
+    day = {"$dateToString": {"format": "%Y-%m-%d", "date": "$ts"}}
+    signed = {"$cond": [
+        {"$eq": [{"$ifNull": ["$direction", "credit"]}, "credit"]},
+        "$amount",
+        {"$multiply": [-1, {"$abs": "$amount"}]},
+    ]}
+    pipeline = [
+        {"$match": match},
+        {"$project": {"_id": 0, "user_id": 1, "day": day, "signed": signed}},
+        {"$group": {"_id": {"u": "$user_id", "d": "$day"} if by_user else "$day", "net": {"$sum": "$signed"}}},
+    ]
+    return db["transactions"].aggregate(pipeline, batchSize=AGG_BATCH_SIZE, allowDiskUse=True)
+
 def load_transactions(user_id: str, days: int = 365) -> pd.DataFrame:
     """
     Loads transactions for user and returns a daily net-flow series (pandas DataFrame with index date).
     """
-    coll = db["transactions"]
     end = datetime.utcnow()
     start = end - timedelta(days=days)
-    cursor = coll.find({"user_id": user_id, "ts": {"$gte": start, "$lte": end}})
-    tx = list(cursor)
-    if not tx:
+    rows = list(_daily_net_rows({"user_id": user_id, "ts": {"$gte": start, "$lte": end}}))
+    if not rows:
         return pd.DataFrame({"amount": []})
 
-    df = pd.DataFrame(tx)
-    # Ensure ts field is a datetime
-    if "ts" in df.columns:
-        df["ts"] = pd.to_datetime(df["ts"])
-    else:
-        # try timestamp fields like timestamp
-        df["ts"] = pd.to_datetime(df.get("timestamp", pd.Series([])))
-    # Convert debit/credit into signed amount if direction field is present
-    if "direction" in df.columns:
-        df["signed_amount"] = df.apply(lambda r: r["amount"] if r.get("direction","credit") == "credit" else -abs(r["amount"]), axis=1)
-    else:
-        df["signed_amount"] = df["amount"]
-    # aggregate daily net flow
-    df["date"] = df["ts"].dt.floor("D")
-    daily = df.groupby("date")["signed_amount"].sum().rename("net").to_frame()
+    dates = pd.to_datetime([r["_id"] for r in rows])
+    net = np.fromiter((r["net"] for r in rows), dtype=float, count=len(rows))
+    daily = pd.Series(net, index=dates).sort_index()
     # reindex to continuous daily index
-    idx = pd.date_range(start=daily.index.min(), end=daily.index.max(), freq="D")
-    daily = daily.reindex(idx, fill_value=0.0)
-    daily.index.name = "date"
-    daily = daily.reset_index()
-    daily["date"] = pd.to_datetime(daily["date"])
-    daily.set_index("date", inplace=True)
-    return daily
+    idx = pd.date_range(start=daily.index.min(), end=daily.index.max(), freq="D", name="date")
+    return daily.reindex(idx, fill_value=0.0).rename("net").to_frame()
+
+def load_daily_series(user_ids=None, days: int = 365) -> Dict[str, pd.Series]:
+    """
+    Daily net-flow series for many users from ONE aggregation.
+    user_ids=None → every user with transactions in the window.
+    """
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    match = {"ts": {"$gte": start, "$lte": end}}
+    if user_ids is not None:
+        match["user_id"] = {"$in": list(user_ids)}
+
+    rows = list(_daily_net_rows(match, by_user=True))
+    if not rows:
+        return {}
+
+    # scatter the user-day rows into one flat buffer of per-user day slots
+    codes, uids = pd.factorize(pd.Index([r["_id"]["u"] for r in rows]))
+    day = pd.to_datetime([r["_id"]["d"] for r in rows]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    net = np.fromiter((r["net"] for r in rows), dtype=float, count=len(rows))
+
+    first = np.full(len(uids), np.iinfo(np.int64).max)
+    last = np.full(len(uids), np.iinfo(np.int64).min)
+    np.minimum.at(first, codes, day)
+    np.maximum.at(last, codes, day)
+    lengths = last - first + 1
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    flat = np.zeros(int(lengths.sum()))
+    np.add.at(flat, offsets[codes] + day - first[codes], net)
+
+    starts = first.astype("datetime64[D]")
+    return {
+        uid: pd.Series(
+            flat[offsets[i]:offsets[i] + lengths[i]],
+            index=pd.date_range(starts[i], periods=int(lengths[i]), freq="D"),
+        )
+        for i, uid in enumerate(uids)
+    }
 
 def create_sequences(series: np.ndarray, seq_len: int):
-    X, y = [], []
-    for i in range(len(series) - seq_len):
-        X.append(series[i:i+seq_len])
-        y.append(series[i+seq_len])
-    X = np.array(X)
-    y = np.array(y)
-    return X, y
-
-def build_model(seq_len: int, n_units: int = 32):
-    model = Sequential()
-    model.add(LSTM(n_units, input_shape=(seq_len, 1)))
-    model.add(Dense(1))
+    """(X, y) training windows as views over `series` (no per-window copies)."""
+    series = np.asarray(series)
+    return sliding_window_view(series[:-1], seq_len), series[seq_len:]
+
+N_UNITS = 32
+
+def build_model(seq_len: int, n_units: int = N_UNITS):
+    rt = tf_runtime.load()
+    model = rt.Sequential()
+    model.add(rt.LSTM(n_units, input_shape=(seq_len, 1)))
+    model.add(rt.Dense(1))
     model.compile(optimizer="adam", loss="mse")
     return model
 
-def forecast_from_series(series: pd.Series, horizon: int = 14, seq_len: int = 14, epochs: int = 10):
+def pad_series(series: pd.Series, seq_len: int) -> pd.Series:
     if len(series) < seq_len + 1:
         # not enough history — pad with zeros
         padded = np.pad(series.values, (seq_len+1 - len(series), 0), "constant", constant_values=0.0)
-        series = pd.Series(padded, index=pd.date_range(end=datetime.utcnow(), periods=len(padded), freq="D"))
+        series = pd.Series(padded, index=pd.date_range(end=series.index[-1] if len(series) else datetime.utcnow(), periods=len(padded), freq="D"))
+    return series
+
+def train_model(series: pd.Series, seq_len: int = 14, epochs: int = 10):
+    """
+    Fit a fresh LSTM on the (padded) series.
+    Returns (model, meta); meta carries everything needed to serve it later.
+    """
+    series = pad_series(series, seq_len)
 
     # normalize
     mean = series.mean()
@@ -89,87 +144,537 @@ def forecast_from_series(series: pd.Series, horizon: int = 14, seq_len: int = 14
 
     X, y = create_sequences(arr, seq_len)
     # reshape for LSTM
-    X = X.reshape((X.shape[0], X.shape[1], 1))
+    X = X[:, :, None]
     y = y.reshape((-1, 1))
 
-    model = build_model(seq_len, n_units=32)
+    model = build_model(seq_len, n_units=N_UNITS)
 
     # tiny training loop (early stop)
-    es = EarlyStopping(monitor="loss", patience=3, restore_best_weights=True, verbose=0)
+    es = tf_runtime.load().EarlyStopping(monitor="loss", patience=3, restore_best_weights=True, verbose=0)
     model.fit(X, y, epochs=epochs, batch_size=16, verbose=0, callbacks=[es])
 
+    trained_at = datetime.utcnow().isoformat()
+    meta = {
+        "seq_len": seq_len,
+        "n_units": N_UNITS,
+        "mean": float(mean),
+        "std": float(std),
+        "trained_samples": len(X),
+        "train_rmse": one_step_rmse(extract_weights(model), X[:, :, 0], y[:, 0]),
+        "data_cutoff": pd.Timestamp(series.index[-1]).isoformat(),
+        "trained_at": trained_at,
+        "full_trained_at": trained_at,
+        "fine_tunes": 0,
+    }
+    return model, meta
+
+def one_step_rmse(weights: dict, X: np.ndarray, y: np.ndarray) -> float:
+    """One-step-ahead RMSE (normalized units) of the model on windows X → y."""
+    if len(X) == 0:
+        return 0.0
+    err = lstm_forward(weights, np.asarray(X, dtype=np.float32)) - y
+    return float(np.sqrt(np.mean(err * err)))
+
+# -------------------------------------------------------
+# WARM-START FINE-TUNING
+# -------------------------------------------------------
+FINETUNE_EPOCHS = int(os.getenv("FORECAST_FINETUNE_EPOCHS", "3"))
+FINETUNE_REPLAY_WINDOWS = int(os.getenv("FORECAST_FINETUNE_REPLAY", "28"))    # old windows mixed in
+FINETUNE_MAX_MEAN_SHIFT = float(os.getenv("FORECAST_FINETUNE_MAX_MEAN_SHIFT", "0.25"))  # in old stds
+FINETUNE_MAX_STD_RATIO = float(os.getenv("FORECAST_FINETUNE_MAX_STD_RATIO", "1.5"))
+FINETUNE_MAX_ERROR_RATIO = float(os.getenv("FORECAST_FINETUNE_MAX_ERROR_RATIO", "2.0"))
+FINETUNE_MAX_COUNT = int(os.getenv("FORECAST_FINETUNE_MAX_COUNT", "10"))    # then a full retrain
+
+def drift_reason(weights: dict, series: pd.Series, meta: dict, new_days: int):
+    """Why fine-tuning is not enough (full retrain needed), or None."""
+    if meta.get("fine_tunes", 0) >= FINETUNE_MAX_COUNT:
+        return "fine_tune_limit"
+
+    padded = pad_series(series, meta["seq_len"])
+    mean, std = meta["mean"], meta["std"]
+    new_std = padded.std() if padded.std() > 0 else 1.0
+    if abs(padded.mean() - mean) / std > FINETUNE_MAX_MEAN_SHIFT:
+        return "drift:mean_shift"
+    if not (1 / FINETUNE_MAX_STD_RATIO <= new_std / std <= FINETUNE_MAX_STD_RATIO):
+        return "drift:std_shift"
+
+    X, y = create_sequences((padded.values - mean) / std, meta["seq_len"])
+    base = meta.get("train_rmse")
+    if base and new_days and one_step_rmse(weights, X[-new_days:], y[-new_days:]) > FINETUNE_MAX_ERROR_RATIO * base:
+        return "drift:error"
+    return None
+
+def fine_tune_model(model, series: pd.Series, meta: dict, new_days: int, epochs: int = FINETUNE_EPOCHS):
+    """
+    Continue training a saved model on the windows that end in new days
+    (plus a few recent old ones), keeping its normalization.
+    Returns (model, meta) with meta updated for the new data.
+    """
+    seq_len = meta["seq_len"]
+    series = pad_series(series, seq_len)
+    arr = (series.values - meta["mean"]) / meta["std"]
+    X, y = create_sequences(arr, seq_len)
+    take = min(len(X), new_days + FINETUNE_REPLAY_WINDOWS)
+    X, y = X[-take:], y[-take:]
+
+    model.fit(X[:, :, None], y[:, None], epochs=epochs, batch_size=16, verbose=0)
+
+    meta = {
+        **meta,
+        "trained_samples": meta["trained_samples"] + new_days,
+        "data_cutoff": pd.Timestamp(series.index[-1]).isoformat(),
+        "trained_at": datetime.utcnow().isoformat(),
+        "fine_tunes": meta.get("fine_tunes", 0) + 1,
+    }
+    return model, meta
+
+# "numpy" → whole horizon in one NumPy rollout; "keras" → model.predict per step
+INFERENCE_ENGINE = os.getenv("FORECAST_INFERENCE", "numpy")
+
+_np_weights = weakref.WeakKeyDictionary()   # { keras model: extracted weights }
+
+def numpy_weights(model):
+    w = _np_weights.get(model)
+    if w is None:
+        w = _np_weights[model] = extract_weights(model)
+    return w
+
+def predict_horizon(model, series: pd.Series, meta: dict, horizon: int = 14, engine: str = None):
+    """
+    Roll the model forward `horizon` days from the end of `series`.
+    `model` is either a keras model or its extracted NumPy weights dict.
+    """
+    seq_len = meta["seq_len"]
+    mean, std = meta["mean"], meta["std"]
+    arr = (pad_series(series, seq_len).values - mean) / std
+
+    if (engine or INFERENCE_ENGINE) == "keras" and not isinstance(model, dict):
+        preds = predict_horizon_keras(model, arr[-seq_len:], horizon)
+    else:
+        weights = model if isinstance(model, dict) else numpy_weights(model)
+        preds = rollout(weights, arr[-seq_len:], horizon)
+
+    # denormalize
+    return np.asarray(preds, dtype=float) * std + mean
+
+def predict_horizon_keras(model, window: np.ndarray, horizon: int):
+    """Reference path: one model.predict call per step."""
+    seq_len = len(window)
     preds = []
-    last_window = arr[-seq_len:].tolist()
+    last_window = window.tolist()
     for _ in range(horizon):
         x = np.array(last_window).reshape((1, seq_len, 1))
         p = model.predict(x, verbose=0)[0,0]
         preds.append(p)
         last_window = last_window[1:] + [p]
+    return np.array(preds)
 
-    # denormalize
-    preds = np.array(preds) * std + mean
-    return preds, {"mean": float(mean), "std": float(std), "trained_samples": len(X)}
+def forecast_from_series(series: pd.Series, horizon: int = 14, seq_len: int = 14, epochs: int = 10):
+    model, meta = train_model(series, seq_len=seq_len, epochs=epochs)
+    preds = predict_horizon(model, series, meta, horizon=horizon)
+    return preds, {"mean": meta["mean"], "std": meta["std"], "trained_samples": meta["trained_samples"]}
 
-@app.route("/predict/<user_id>", methods=["POST", "GET"])
-def predict(user_id):
+# -------------------------------------------------------
+# MODEL REGISTRY (train once, serve many)
+# -------------------------------------------------------
+registry = ModelRegistry(
+    build_fn=lambda meta: build_model(meta["seq_len"], n_units=meta.get("n_units", N_UNITS)),
+    extract_fn=extract_weights,
+)
+
+def get_or_train(user_id: str, series: pd.Series, seq_len: int, epochs: int, force: bool = False):
+    """
+    Serve the user's saved model unless it is missing, stale or behind on data.
+    Returns (weights, meta, source) with source "cache", "fine_tuned:<n>d"
+    or "trained:<reason>";
+    weights are the NumPy LSTM weights, so serving a cached model needs no TF.
+    """
+    entry = registry.get(user_id)
+    reason = "forced" if force else registry.stale_reason(entry[1] if entry else None, series, seq_len)
+    if reason is None:
+        return entry[0], entry[1], "cache"
+
+    with registry.user_lock(user_id):
+        # another request may have retrained while we waited
+        if not force:
+            entry = registry.get(user_id)
+            if entry is not None and registry.stale_reason(entry[1], series, seq_len) is None:
+                return entry[0], entry[1], "cache"
+
+        # only new days on an otherwise healthy model → warm start from saved weights
+        if reason == "new_data" and entry is not None:
+            tuned = try_fine_tune(user_id, entry, series)
+            if tuned is not None:
+                return tuned
+            reason = "new_data:full"
+
+        model, meta = train_model(series, seq_len=seq_len, epochs=epochs)
+        weights = registry.save(user_id, model, meta)
+    return weights, meta, f"trained:{reason}"
+
+def try_fine_tune(user_id: str, entry, series: pd.Series):
+    """(weights, meta, source) after a warm-start fine-tune, or None when a full retrain is due."""
+    weights, meta = entry
+    new_days = int((series.index > pd.Timestamp(meta["data_cutoff"])).sum())
+
+    drift = drift_reason(weights, series, meta, new_days)
+    if drift is not None:
+        print(f"⚠ Full retrain for {user_id}: {drift}")
+        return None
+
+    model = registry.load_model(user_id, meta)
+    if model is None:
+        return None
+
+    model, meta = fine_tune_model(model, series, meta, new_days)
+    weights = registry.save(user_id, model, meta)
+    return weights, meta, f"fine_tuned:{new_days}d"
+
+# -------------------------------------------------------
+# GLOBAL MODEL (one LSTM for all users, batch refresh)
+# -------------------------------------------------------
+GLOBAL_MAX_WINDOWS_PER_USER = int(os.getenv("FORECAST_GLOBAL_MAX_WINDOWS", "180"))
+
+def train_global_model(user_ids=None, seq_len: int = 14, epochs: int = 5, batch_size: int = 512):
     """
-    Trigger a prediction for user_id.
-    Optional query param: horizon (days)
+    Fit the shared model on the normalized windows of many users at once.
+    Returns the saved meta (or None when there is no data).
     """
+    series_by_user = load_daily_series(user_ids, days=365)
+    X, y, n_users = build_training_set(series_by_user, seq_len, GLOBAL_MAX_WINDOWS_PER_USER)
+    if not n_users:
+        return None
+
+    model = build_model(seq_len, n_units=N_UNITS)
+    es = tf_runtime.load().EarlyStopping(monitor="loss", patience=2, restore_best_weights=True, verbose=0)
+    model.fit(X[:, :, None], y[:, None], epochs=epochs, batch_size=batch_size, verbose=0, callbacks=[es])
+
+    meta = {
+        "model": GLOBAL_MODEL_NAME,
+        "seq_len": seq_len,
+        "n_units": N_UNITS,
+        "users": n_users,
+        "trained_samples": int(len(X)),
+        "trained_at": datetime.utcnow().isoformat(),
+    }
+    registry.save(GLOBAL_KEY, model, meta)
+    return meta
+
+def forecast_many(user_ids=None, horizon: int = 14, store: bool = True):
+    """
+    Forecast many users with the global model in one vectorized rollout.
+    Returns None when no global model has been trained yet.
+    """
+    entry = registry.get(GLOBAL_KEY)
+    if entry is None:
+        return None
+    weights, gmeta = entry
+
+    series_by_user = load_daily_series(user_ids, days=365)
+    ids, preds = predict_batch(weights, series_by_user, gmeta["seq_len"], horizon)
+
+    created_at = datetime.utcnow()
+    steps = pd.to_timedelta(np.arange(1, horizon + 1), unit="D")
+    forecasts, docs = {}, []
+    for uid, row in zip(ids, preds):
+        dates = (series_by_user[uid].index[-1] + steps).to_pydatetime()
+        forecasts[uid] = [{"as_of": d.isoformat(), "pred": float(v)} for d, v in zip(dates, row)]
+        docs.append({
+            "user_id": uid,
+            "created_at": created_at,
+            "horizon": horizon,
+            "frequency": "daily",
+            "predictions": [{"as_of": d, "pred": float(v)} for d, v in zip(dates, row)],
+            "meta": {"model": GLOBAL_MODEL_NAME, "trained_at": gmeta["trained_at"]},
+        })
+
+    if store and docs:
+        db.forecasts.insert_many(docs, ordered=False)
+
+    missing = sorted(set(user_ids or []) - set(ids))
+    return {"model": GLOBAL_MODEL_NAME, "count": len(ids), "missing": missing, "forecasts": forecasts}
+
+MODEL_NAMES = {"lstm": "lstm-v1", "ets": "ets-v1"}
+
+# -------------------------------------------------------
+# FORECAST RESULT CACHE (latest doc per user, keyed by data version)
+# -------------------------------------------------------
+RESULT_MAX_AGE_HOURS = float(os.getenv("FORECAST_RESULT_MAX_AGE_HOURS", "24"))
+
+_indexes_ready = False
+
+def ensure_indexes():
+    """Indexes backing the latest-forecast and data-version lookups (once per process)."""
+    global _indexes_ready
+    if _indexes_ready:
+        return
     try:
-        horizon = int(request.args.get("horizon", "14"))
-        seq_len = int(request.args.get("seq_len", "14"))
-        epochs = int(request.args.get("epochs", "10"))
-    except Exception:
-        horizon, seq_len, epochs = 14, 14, 10
+        db.forecasts.create_index([("user_id", 1), ("created_at", -1)])
+        db.transactions.create_index([("user_id", 1), ("ts", -1)])
+    except Exception as e:
+        print("⚠ Index creation failed:", e)
+    _indexes_ready = True
+
+def data_version(user_id: str) -> dict:
+    """Cheap fingerprint of the user's transactions: count + newest ts (both index-only)."""
+    ensure_indexes()
+    coll = db["transactions"]
+    newest = coll.find_one({"user_id": user_id}, {"ts": 1}, sort=[("ts", -1)])
+    last_ts = newest.get("ts") if newest else None
+    return {
+        "count": coll.count_documents({"user_id": user_id}),
+        "last_ts": last_ts.isoformat() if isinstance(last_ts, datetime) else last_ts,
+    }
+
+def latest_forecast(user_id: str, query: dict = None):
+    """Newest stored forecast for the user (optionally matching `query`), or None."""
+    ensure_indexes()
+    return db.forecasts.find_one({"user_id": user_id, **(query or {})}, sort=[("created_at", -1)])
+
+def response_doc(doc: dict, cached: bool) -> dict:
+    """Response-safe version of a stored forecast (datetimes → ISO strings)."""
+    return {
+        "user_id": doc["user_id"],
+        "created_at": doc["created_at"].isoformat(),
+        "horizon": doc["horizon"],
+        "frequency": doc.get("frequency", "daily"),
+        "predictions": [{"as_of": p["as_of"].isoformat(), "pred": p["pred"]} for p in doc["predictions"]],
+        "meta": doc["meta"],
+        "cached": cached,
+    }
+
+def run_forecast(user_id: str, horizon: int = 14, seq_len: int = 14, epochs: int = 10,
+                 force: bool = False, engine: str = "lstm"):
+    """
+    Load history, train/serve the model, store the forecast.
+    Returns the response-safe forecast doc, or None when the user has no transactions.
+    A stored forecast computed on the same data version is returned as is
+    (cached=True) unless force is set.
+    Shared by the synchronous /predict route and the job workers.
+    """
+    version = data_version(user_id)
+    if not version["count"]:
+        return None
+
+    model_name = MODEL_NAMES[engine]
+    cache_query = {"horizon": horizon, "meta.model": model_name, "meta.data_version": version}
+    if engine == "lstm":
+        cache_query["meta.seq_len"] = seq_len
+    if not force:
+        hit = latest_forecast(user_id, cache_query)
+        if hit is not None and datetime.utcnow() - hit["created_at"] < timedelta(hours=RESULT_MAX_AGE_HOURS):
+            return response_doc(hit, cached=True)
 
     # load last 365 days
     daily = load_transactions(user_id, days=365)
     if daily.empty:
-        return jsonify({"error": "no_transactions"}), 404
+        return None
 
     series = daily["net"]
-    preds, meta = forecast_from_series(series, horizon=horizon, seq_len=seq_len, epochs=epochs)
+    if engine == "ets":
+        preds, meta = ets_forecast(series.values, horizon=horizon)
+        meta = {"model": model_name, **meta}
+    else:
+        model, model_meta, source = get_or_train(user_id, series, seq_len, epochs, force=force)
+        if INFERENCE_ENGINE == "keras":
+            model = registry.load_model(user_id, model_meta) or model
+        preds = predict_horizon(model, series, model_meta, horizon=horizon)
+        meta = {
+            "model": model_name,
+            "seq_len": seq_len,
+            "mean": model_meta["mean"],
+            "std": model_meta["std"],
+            "trained_samples": model_meta["trained_samples"],
+            "data_cutoff": model_meta["data_cutoff"],
+            "trained_at": model_meta["trained_at"],
+            "fine_tunes": model_meta.get("fine_tunes", 0),
+            "model_source": source,
+        }
+    meta["data_version"] = version
 
-       # build forecast docs
-    # NOTE: keep real datetimes for DB insert, but return ISO strings to the HTTP client
+    # build forecast doc (keep real datetimes for Mongo)
     today = pd.to_datetime(series.index[-1])
-    mongo_predictions = []
-    response_predictions = []
-    for i, val in enumerate(preds, 1):
-        as_of_dt = (today + pd.Timedelta(days=i)).to_pydatetime()
-        mongo_predictions.append({"as_of": as_of_dt, "pred": float(val)})
-        response_predictions.append({"as_of": as_of_dt.isoformat(), "pred": float(val)})
-
     mongo_doc = {
         "user_id": user_id,
         "created_at": datetime.utcnow(),
         "horizon": horizon,
         "frequency": "daily",
-        "predictions": mongo_predictions,
-        "meta": {"model": "lstm-v1", **meta}
+        "predictions": [
+            {"as_of": (today + pd.Timedelta(days=i)).to_pydatetime(), "pred": float(val)}
+            for i, val in enumerate(preds, 1)
+        ],
+        "meta": meta
     }
 
-    # store into forecasts (keep datetimes for Mongo)
+    # store into forecasts
     db.forecasts.insert_one(mongo_doc)
+    return response_doc(mongo_doc, cached=False)
 
-    # prepare a response-safe version (datetimes → ISO strings)
-    response_doc = {
-        "user_id": user_id,
-        "created_at": mongo_doc["created_at"].isoformat(),
+def forecast_params(args):
+    """Parse the shared query params; returns (params, error_response)."""
+    try:
+        horizon = int(args.get("horizon", "14"))
+        seq_len = int(args.get("seq_len", "14"))
+        epochs = int(args.get("epochs", "10"))
+    except Exception:
+        horizon, seq_len, epochs = 14, 14, 10
+    engine = args.get("model", "lstm").lower()
+    if engine not in ("lstm", "ets"):
+        return None, (jsonify({"error": "unknown_model", "allowed": ["lstm", "ets"]}), 400)
+    return {
         "horizon": horizon,
-        "frequency": "daily",
-        "predictions": response_predictions,
-        "meta": mongo_doc["meta"]
-    }
+        "seq_len": seq_len,
+        "epochs": epochs,
+        "force": args.get("retrain", "0") in ("1", "true", "yes"),
+        "engine": engine,
+    }, None
+
+@app.route("/predict/<user_id>", methods=["POST", "GET"])
+def predict(user_id):
+    """
+    Trigger a prediction for user_id (synchronous — prefer the job API below).
+    Optional query params: horizon (days), seq_len, epochs, retrain=1,
+    model=lstm|ets (ets = vectorized exponential smoothing, no TF).
+    Served from the last stored forecast while the user's data is unchanged.
+    """
+    params, error = forecast_params(request.args)
+    if error:
+        return error
+
+    forecast = run_forecast(user_id, **params)
+    if forecast is None:
+        return jsonify({"error": "no_transactions"}), 404
+    return jsonify({"status": "ok", "cached": forecast["cached"], "forecast": forecast})
+
+@app.route("/forecast/latest/<user_id>")
+def get_latest_forecast(user_id):
+    """Newest stored forecast, no compute (optional query param: model=lstm|ets)."""
+    query = {}
+    if "model" in request.args:
+        query["meta.model"] = MODEL_NAMES.get(request.args["model"].lower(), request.args["model"])
+    doc = latest_forecast(user_id, query)
+    if doc is None:
+        return jsonify({"error": "no_forecast"}), 404
+    return jsonify({"status": "ok", "forecast": response_doc(doc, cached=True)})
+
+# -------------------------------------------------------
+# ASYNC JOB API (training runs in the worker pool)
+# -------------------------------------------------------
+@app.route("/predict/<user_id>/jobs", methods=["POST"])
+def submit_forecast_job(user_id):
+    """
+    Enqueue a forecast; same query params as /predict.
+    202 + job_id; a job already queued/running for the user is reused.
+    """
+    params, error = forecast_params(request.args)
+    if error:
+        return error
+
+    try:
+        job, deduplicated = jobs.submit(user_id, params)
+    except jobs.QueueFull:
+        return jsonify({"error": "queue_full", "retry_after": 5}), 503, {"Retry-After": "5"}
+
+    return jsonify({
+        "status": job["status"],
+        "job_id": job["_id"],
+        "deduplicated": deduplicated,
+        "poll": f"/jobs/{job['_id']}",
+    }), 202
+
+@app.route("/jobs/<job_id>")
+def get_forecast_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "job_not_found"}), 404
+    return jsonify(job), (200 if job["status"] in ("done", "failed") else 202)
 
-    return jsonify({"status": "ok", "forecast": response_doc})
+BATCH_MAX_USERS = int(os.getenv("FORECAST_BATCH_MAX_USERS", "1000"))
 
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch_route():
+    """
+    Forecast many users with the global model.
+    JSON body: {"user_ids": [...]} (omit → every user with transactions;
+    otherwise a non-empty list of at most FORECAST_BATCH_MAX_USERS strings),
+    query params: horizon, store=0 to skip writing db.forecasts
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "invalid_body", "expected": {"user_ids": ["..."]}}), 400
+    user_ids = body.get("user_ids")
+    if user_ids is not None and (
+        not isinstance(user_ids, list) or not user_ids
+        or not all(isinstance(u, str) and u for u in user_ids)
+    ):
+        return jsonify({"error": "invalid_user_ids", "expected": "non-empty list of strings"}), 400
+    if user_ids is not None and len(user_ids) > BATCH_MAX_USERS:
+        return jsonify({"error": "too_many_user_ids", "max": BATCH_MAX_USERS}), 400
+    try:
+        horizon = int(request.args.get("horizon", "14"))
+    except Exception:
+        horizon = 14
+    store = request.args.get("store", "1") in ("1", "true", "yes")
+
+    result = forecast_many(user_ids, horizon=horizon, store=store)
+    if result is None:
+        return jsonify({"error": "no_global_model", "train": "/train/global"}), 409
+    return jsonify({"status": "ok", **result})
+
+@app.route("/train/global", methods=["POST"])
+def train_global_route():
+    """Enqueue a global-model training job (query params: seq_len, epochs)."""
+    try:
+        params = {
+            "seq_len": int(request.args.get("seq_len", "14")),
+            "epochs": int(request.args.get("epochs", "5")),
+        }
+    except Exception:
+        params = {"seq_len": 14, "epochs": 5}
+
+    try:
+        job, deduplicated = jobs.submit(GLOBAL_KEY, params, task="train_global")
+    except jobs.QueueFull:
+        return jsonify({"error": "queue_full", "retry_after": 5}), 503, {"Retry-After": "5"}
+    return jsonify({
+        "status": job["status"],
+        "job_id": job["_id"],
+        "deduplicated": deduplicated,
+        "poll": f"/jobs/{job['_id']}",
+    }), 202
 
-   
 @app.route("/health")
 def health():
     return jsonify({"status": "ok", "mongodb": bool(db.list_collection_names())})
 
+@app.route("/ready")
+def ready():
+    """
+    Readiness: 200 once TF is loaded in this process, the runtime synchronous
+    /predict trains with, so it never starts with a cold import. The job
+    workers load their own TF and are reported separately (a job queued
+    while they warm up just waits).
+    """
+    is_ready = tf_runtime.is_ready()
+    body = {
+        "status": "ready" if is_ready else "warming",
+        "runtimes": {
+            "predict": tf_runtime.status(),
+            "jobs": jobs.stats(),
+        },
+        "inference_engine": INFERENCE_ENGINE,
+        "models_cached": registry.cached_count(),
+    }
+    return jsonify(body), (200 if is_ready else 503)
+
+# warm up in the background so /health answers immediately:
+# FORECAST_WARM_POOL starts the job workers, FORECAST_WARM_TF loads TF here.
+# Both are off by default so importing this module (tools/, job workers)
+# stays cheap; the server enables them through docker-compose.
+if os.getenv("FORECAST_WARM_POOL", "0") in ("1", "true", "yes"):
+    jobs.warm_up()
+if os.getenv("FORECAST_WARM_TF", "0") in ("1", "true", "yes"):
+    tf_runtime.warm_up_async()
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
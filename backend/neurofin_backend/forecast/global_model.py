@@ -0,0 +1,84 @@
+# global_model.py
+"""
+One shared LSTM for every user (cross-user / "global" forecasting).
+
+Each user's daily net flow is z-normalized with its own mean/std, so a
+single model learns the shape of cash-flow dynamics across the whole
+user base. Training windows come from a zero-copy sliding-window view of
+each normalized series; prediction stacks the last window of every user
+and runs one batched NumPy rollout.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lstm_numpy import rollout
+
+GLOBAL_KEY = "__global__"                 # registry slot of the shared model
+GLOBAL_MODEL_NAME = "global-lstm-v1"
+
+
+def _pad(values: np.ndarray, seq_len: int) -> np.ndarray:
+    """Left-pad short histories with zeros (same rule as pad_series)."""
+    if len(values) < seq_len + 1:
+        return np.pad(values, (seq_len + 1 - len(values), 0), "constant", constant_values=0.0)
+    return values
+
+
+def normalize(values) -> tuple:
+    """(z, mean, std) for one user's padded series."""
+    arr = np.asarray(values, dtype=np.float32)
+    mean = float(arr.mean())
+    std = float(arr.std(ddof=1)) if len(arr) > 1 else 0.0
+    std = std if std > 0 else 1.0
+    return (arr - mean) / std, mean, std
+
+
+def user_windows(z: np.ndarray, seq_len: int):
+    """(X, y) views over one normalized series: X[i] = z[i:i+seq_len], y[i] = z[i+seq_len]."""
+    return sliding_window_view(z[:-1], seq_len), z[seq_len:]
+
+
+def build_training_set(series_by_user: dict, seq_len: int, max_windows_per_user: int = None):
+    """
+    Stack the windows of every user into one (N, seq_len) matrix.
+    max_windows_per_user keeps only the most recent windows so heavy
+    users do not dominate the shared model.
+    Returns (X, y, n_users).
+    """
+    xs, ys = [], []
+    for series in series_by_user.values():
+        z, _, _ = normalize(_pad(np.asarray(series, dtype=np.float32), seq_len))
+        X, y = user_windows(z, seq_len)
+        if max_windows_per_user:
+            X, y = X[-max_windows_per_user:], y[-max_windows_per_user:]
+        xs.append(X)
+        ys.append(y)
+
+    if not xs:
+        return np.empty((0, seq_len), dtype=np.float32), np.empty(0, dtype=np.float32), 0
+    # the only copy: views → one contiguous training matrix
+    return np.concatenate(xs), np.concatenate(ys), len(xs)
+
+
+def last_windows(series_by_user: dict, seq_len: int):
+    """Latest normalized window of every user → (user_ids, windows (n, seq_len), means, stds)."""
+    user_ids = list(series_by_user)
+    windows = np.empty((len(user_ids), seq_len), dtype=np.float32)
+    means = np.empty(len(user_ids))
+    stds = np.empty(len(user_ids))
+    for i, uid in enumerate(user_ids):
+        z, means[i], stds[i] = normalize(_pad(np.asarray(series_by_user[uid], dtype=np.float32), seq_len))
+        windows[i] = z[-seq_len:]
+    return user_ids, windows, means, stds
+
+
+def predict_batch(weights: dict, series_by_user: dict, seq_len: int, horizon: int = 14):
+    """
+    Forecast every user in one vectorized rollout.
+    Returns (user_ids, preds) with preds (n_users, horizon) in original units.
+    """
+    user_ids, windows, means, stds = last_windows(series_by_user, seq_len)
+    if not user_ids:
+        return [], np.empty((0, horizon))
+    preds = rollout(weights, windows, horizon).astype(float)
+    return user_ids, preds * stds[:, None] + means[:, None]
@@ -0,0 +1,240 @@
+# jobs.py
+"""
+Asynchronous forecast jobs.
+
+The web tier only enqueues: POST /predict/<user_id>/jobs writes a job doc
+to Mongo and hands it to a pool of worker processes; GET /jobs/<id> reads
+the doc back. Training (and TensorFlow) lives in the workers, each with
+bounded TF intra/inter-op threads, so a burst of forecasts waits in the
+queue instead of holding Flask threads.
+"""
+import os
+import json
+import uuid
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pymongo import MongoClient
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongodb:27017")
+MONGO_DB = os.getenv("MONGO_DB", "neurofin")
+
+# -------------------------------------------------------
+# POOL CONFIG
+# -------------------------------------------------------
+FORECAST_WORKERS = max(1, int(os.getenv("FORECAST_WORKERS", "2")))
+JOB_QUEUE_MAX = int(os.getenv("FORECAST_JOB_QUEUE_MAX", "200"))        # queued + running
+JOB_TTL_HOURS = float(os.getenv("FORECAST_JOB_TTL_HOURS", "24"))        # job docs expire after
+
+client = MongoClient(MONGO_URI)
+jobs_coll = client[MONGO_DB]["forecast_jobs"]
+
+
+class QueueFull(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_pool = None
+_active = {}                       # { (user_id, task, params): job_id } queued or running in this process
+_counters = {"submitted": 0, "deduplicated": 0, "done": 0, "failed": 0}
+_workers_ready = threading.Event()
+_warm_requested = threading.Event()   # warm_up() was called → warm replacement pools too
+
+
+# -------------------------------------------------------
+# WORKER SIDE (runs in the pool processes)
+# -------------------------------------------------------
+def _init_worker():
+    """Load TF once per worker (thread limits come from TF_*_OP_THREADS)."""
+    os.environ["FORECAST_WARM_TF"] = "0"     # load synchronously below, no warm-up thread
+    os.environ["FORECAST_WARM_POOL"] = "0"   # workers never start a pool of their own
+    import tf_runtime
+    try:
+        tf_runtime.load()
+    except Exception as e:
+        print("⚠ Forecast worker started without TensorFlow:", e)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _update(job_id, **fields):
+    jobs_coll.update_one({"_id": job_id}, {"$set": fields})
+
+
+def _run_job(job_id, user_id, params, task="forecast"):
+    import forecast_service     # imported inside the worker process only
+
+    _update(job_id, status="running", started_at=datetime.utcnow(), worker_pid=os.getpid())
+    try:
+        if task == "train_global":
+            forecast = forecast_service.train_global_model(**params)
+        else:
+            forecast = forecast_service.run_forecast(user_id, **params)
+    except Exception as e:
+        print("⚠ Forecast job failed:", job_id, e)
+        _update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        return "failed"
+
+    if forecast is None:
+        _update(job_id, status="failed", error="no_transactions", finished_at=datetime.utcnow())
+        return "failed"
+
+    _update(job_id, status="done", result=forecast, finished_at=datetime.utcnow())
+    return "done"
+
+
+# -------------------------------------------------------
+# WEB SIDE
+# -------------------------------------------------------
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: workers get fresh Mongo clients and their own TF runtime
+            _pool = ProcessPoolExecutor(
+                max_workers=FORECAST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            try:
+                jobs_coll.create_index("created_at", expireAfterSeconds=int(JOB_TTL_HOURS * 3600))
+                jobs_coll.create_index([("user_id", 1), ("created_at", -1)])
+            except Exception as e:
+                print("⚠ Could not create forecast_jobs indexes:", e)
+        return _pool
+
+
+def _reset_pool(pool):
+    """Drop a broken pool (a worker died, e.g. TF OOM) so later jobs get a fresh one."""
+    global _pool
+    with _lock:
+        if _pool is not pool:
+            return
+        _pool = None
+        _workers_ready.clear()
+    print("⚠ Forecast worker pool broken, starting a new one")
+    if _warm_requested.is_set():
+        warm_up()
+
+
+def _submit_to_pool(*args):
+    pool = _get_pool()
+    try:
+        return pool, pool.submit(*args)
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        pool = _get_pool()
+        return pool, pool.submit(*args)
+
+
+def _job_key(user_id, task, params):
+    return user_id, task, json.dumps(params, sort_keys=True, default=str)
+
+
+def warm_up():
+    """Start the workers (and their TF import) before the first job arrives."""
+    _warm_requested.set()
+    pool = _get_pool()
+    futures = [pool.submit(_ping) for _ in range(FORECAST_WORKERS)]
+
+    def _wait():
+        try:
+            for f in futures:
+                f.result()
+            _workers_ready.set()
+        except Exception as e:
+            print("⚠ Forecast worker warm-up failed:", e)
+
+    threading.Thread(target=_wait, name="forecast-pool-warmup", daemon=True).start()
+
+
+def submit(user_id: str, params: dict, task: str = "forecast"):
+    """
+    Enqueue a job for user_id (task: "forecast" | "train_global").
+    Returns (job, deduplicated); a queued/running job with the same user,
+    task and params is reused.
+    """
+    key = _job_key(user_id, task, params)
+    with _lock:
+        existing = _active.get(key)
+        if existing is not None:
+            job = jobs_coll.find_one({"_id": existing})
+            if job is not None and job["status"] in ("queued", "running"):
+                _counters["deduplicated"] += 1
+                return job, True
+        if len(_active) >= JOB_QUEUE_MAX:
+            raise QueueFull()
+
+        job = {
+            "_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "task": task,
+            "params": params,
+            "status": "queued",
+            "created_at": datetime.utcnow(),
+        }
+        jobs_coll.insert_one(job)
+        _active[key] = job["_id"]
+        _counters["submitted"] += 1
+
+    try:
+        pool, future = _submit_to_pool(_run_job, job["_id"], user_id, params, task)
+    except Exception as e:
+        _finish(key, job["_id"], "failed", error=str(e))
+        job.update(status="failed", error=str(e))
+        return job, False
+
+    def _done(f):
+        try:
+            outcome = f.result()
+        except Exception as e:                   # worker crashed / pool broken
+            outcome = "failed"
+            _update(job["_id"], status="failed", error=str(e) or type(e).__name__,
+                    finished_at=datetime.utcnow())
+            if isinstance(e, BrokenProcessPool):
+                _reset_pool(pool)                # every in-flight job of that pool lands here
+        _finish(key, job["_id"], outcome)
+
+    future.add_done_callback(_done)
+    return job, False
+
+
+def _finish(key, job_id, outcome, error=None):
+    if error is not None:
+        _update(job_id, status="failed", error=error, finished_at=datetime.utcnow())
+    with _lock:
+        if _active.get(key) == job_id:
+            del _active[key]
+        _counters["done" if outcome == "done" else "failed"] += 1
+
+
+def get(job_id: str):
+    """Response-safe job doc (datetimes → ISO strings) or None."""
+    job = jobs_coll.find_one({"_id": job_id})
+    if job is None:
+        return None
+    job["job_id"] = job.pop("_id")
+    for k in ("created_at", "started_at", "finished_at"):
+        if isinstance(job.get(k), datetime):
+            job[k] = job[k].isoformat()
+    return job
+
+
+def workers_ready() -> bool:
+    return _workers_ready.is_set()
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "workers": FORECAST_WORKERS,
+            "workers_ready": _workers_ready.is_set(),
+            "active": len(_active),
+            **_counters,
+        }
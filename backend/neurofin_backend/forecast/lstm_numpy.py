@@ -0,0 +1,73 @@
+# lstm_numpy.py
+"""
+Pure NumPy inference for the forecast LSTM (LSTM(units) → Dense(1)).
+
+The whole autoregressive horizon runs in one call with no Keras
+dispatch, and it is vectorized over a batch of windows, so 14 or 90
+days for one user or thousands of users cost a handful of small matmuls
+per step.
+"""
+import numpy as np
+
+
+def extract_weights(model) -> dict:
+    """Pull LSTM/Dense weights out of a trained Keras model (gate order i, f, c, o)."""
+    lstm, dense = model.layers[0], model.layers[-1]
+    kernel, recurrent, bias = lstm.get_weights()
+    dense_w, dense_b = dense.get_weights()
+    return {
+        "kernel": kernel.astype(np.float32),          # (1, 4u)
+        "recurrent": recurrent.astype(np.float32),    # (u, 4u)
+        "bias": bias.astype(np.float32),              # (4u,)
+        "dense_w": dense_w.astype(np.float32),        # (u, 1)
+        "dense_b": dense_b.astype(np.float32),        # (1,)
+        "units": recurrent.shape[0],
+    }
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def lstm_forward(weights: dict, windows: np.ndarray) -> np.ndarray:
+    """
+    One forward pass for a batch of windows.
+    windows: (n, seq_len) normalized values → returns (n,) next-step predictions.
+    """
+    u = weights["units"]
+    n, seq_len = windows.shape
+    h = np.zeros((n, u), dtype=np.float32)
+    c = np.zeros((n, u), dtype=np.float32)
+
+    # input projection for every step at once: (n, seq_len, 4u)
+    x_proj = windows[:, :, None] * weights["kernel"][0] + weights["bias"]
+    rec = weights["recurrent"]
+
+    for t in range(seq_len):
+        z = x_proj[:, t, :] + h @ rec
+        gates = _sigmoid(z)                 # i, f, o read from here; c-gate uses tanh
+        g = np.tanh(z[:, 2 * u:3 * u])
+        c = gates[:, u:2 * u] * c + gates[:, :u] * g
+        h = gates[:, 3 * u:] * np.tanh(c)
+
+    return (h @ weights["dense_w"] + weights["dense_b"])[:, 0]
+
+
+def rollout(weights: dict, windows: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Autoregressive multi-step forecast, same recurrence as the Keras
+    predict-per-step loop. windows: (seq_len,) or (n, seq_len);
+    returns (horizon,) or (n, horizon) in normalized units.
+    """
+    single = windows.ndim == 1
+    win = np.atleast_2d(np.asarray(windows, dtype=np.float32)).copy()
+    n, seq_len = win.shape
+
+    out = np.empty((n, horizon), dtype=np.float32)
+    for step in range(horizon):
+        p = lstm_forward(weights, win)
+        out[:, step] = p
+        win[:, :-1] = win[:, 1:]
+        win[:, -1] = p
+
+    return out[0] if single else out
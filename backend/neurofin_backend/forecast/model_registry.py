@@ -0,0 +1,165 @@
+# model_registry.py
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------
+# PER-USER MODEL REGISTRY
+# keras weights  → {MODEL_DIR}/{key}.weights.h5  (training / fine-tuning)
+# numpy weights  → {MODEL_DIR}/{key}.npz         (inference, no TF needed)
+# metadata       → {MODEL_DIR}/{key}.json
+# -------------------------------------------------------
+MODEL_DIR = os.getenv("FORECAST_MODEL_DIR", "/app/models")
+MODEL_CACHE_SIZE = int(os.getenv("FORECAST_MODEL_CACHE", "32"))          # models kept in memory
+RETRAIN_NEW_DAYS = int(os.getenv("FORECAST_RETRAIN_NEW_DAYS", "7"))      # new days before retrain
+MODEL_MAX_AGE_HOURS = float(os.getenv("FORECAST_MODEL_MAX_AGE_HOURS", "168"))
+
+
+def _file_key(user_id: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", str(user_id))[:64]
+    digest = hashlib.sha1(str(user_id).encode("utf-8")).hexdigest()[:10]
+    return f"{safe}-{digest}"
+
+
+class ModelRegistry:
+    """
+    Trained forecast models per user:
+    ✔ weights + training metadata persisted on disk (survive restarts)
+    ✔ inference artifacts (NumPy weights + meta) load without TensorFlow
+    ✔ small in-memory LRU of loaded weights, re-read when another process
+      (job worker) saved a newer model
+    ✔ stale_reason() decides when a retrain is due
+    """
+
+    def __init__(self, build_fn, extract_fn, model_dir=MODEL_DIR, cache_size=MODEL_CACHE_SIZE):
+        self.build_fn = build_fn            # build_fn(meta) → un-trained keras model of the right shape
+        self.extract_fn = extract_fn        # extract_fn(model) → NumPy weights dict
+        self.model_dir = model_dir
+        self.cache_size = cache_size
+        self._entries = OrderedDict()       # { user_id: (weights, meta, meta mtime_ns) }
+        self._user_locks = {}
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(self.model_dir, exist_ok=True)
+        except OSError as e:
+            print("⚠ Model dir not writable, models will not persist:", e)
+
+    # ---------------- paths ----------------
+    def _paths(self, user_id):
+        base = os.path.join(self.model_dir, _file_key(user_id))
+        return base + ".weights.h5", base + ".npz", base + ".json"
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def user_lock(self, user_id) -> threading.Lock:
+        """One trainer per user at a time."""
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    # ---------------- read ----------------
+    def get(self, user_id):
+        """(numpy weights, meta) or None — never touches TensorFlow."""
+        _, npz_path, meta_path = self._paths(user_id)
+        disk_mtime = self._mtime(meta_path)     # meta is written last on save
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and disk_mtime in (None, entry[2]):
+                self._entries.move_to_end(user_id)
+                return entry[0], entry[1]
+
+        if disk_mtime is None or not os.path.exists(npz_path):
+            return None
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with np.load(npz_path) as data:
+                weights = {k: data[k] for k in data.files}
+            weights["units"] = int(weights["recurrent"].shape[0])
+        except Exception as e:
+            print("⚠ Could not load saved model for", user_id, e)
+            return None
+
+        self._remember(user_id, weights, meta, disk_mtime)
+        return weights, meta
+
+    def meta(self, user_id):
+        entry = self.get(user_id)
+        return entry[1] if entry else None
+
+    def load_model(self, user_id, meta):
+        """Keras model with the saved weights (needs TF), or None."""
+        h5_path, _, _ = self._paths(user_id)
+        if not os.path.exists(h5_path):
+            return None
+        try:
+            model = self.build_fn(meta)
+            model.load_weights(h5_path)
+            return model
+        except Exception as e:
+            print("⚠ Could not load keras model for", user_id, e)
+            return None
+
+    # ---------------- write ----------------
+    def save(self, user_id, model, meta):
+        """Persist a freshly trained keras model; returns its NumPy weights."""
+        weights = self.extract_fn(model)
+        h5_path, npz_path, meta_path = self._paths(user_id)
+        try:
+            model.save_weights(h5_path)
+            # replace, not rewrite: other processes may be reading these files
+            with open(npz_path + ".tmp", "wb") as f:
+                np.savez(f, **{k: v for k, v in weights.items() if k != "units"})
+            os.replace(npz_path + ".tmp", npz_path)
+            tmp_meta = meta_path + ".tmp"
+            with open(tmp_meta, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+        except Exception as e:
+            print("⚠ Could not persist model for", user_id, e)
+        self._remember(user_id, weights, meta, self._mtime(meta_path))
+        return weights
+
+    def _remember(self, user_id, weights, meta, mtime):
+        with self._lock:
+            self._entries[user_id] = (weights, meta, mtime)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.cache_size:
+                self._entries.popitem(last=False)
+
+    def cached_count(self):
+        with self._lock:
+            return len(self._entries)
+
+    # ---------------- policy ----------------
+    @staticmethod
+    def stale_reason(meta, series: pd.Series, seq_len: int):
+        """Why the model must be retrained, or None when it can be served as is."""
+        if meta is None:
+            return "no_model"
+        if meta.get("seq_len") != seq_len:
+            return "seq_len_changed"
+
+        # fine-tunes refresh trained_at; the age limit is on the last full training
+        trained_at = datetime.fromisoformat(meta.get("full_trained_at", meta["trained_at"]))
+        if datetime.utcnow() - trained_at > timedelta(hours=MODEL_MAX_AGE_HOURS):
+            return "stale"
+
+        cutoff = pd.Timestamp(meta["data_cutoff"])
+        new_days = int((series.index > cutoff).sum())
+        if new_days >= RETRAIN_NEW_DAYS:
+            return "new_data"
+        return None
@@ -0,0 +1,102 @@
+# stat_models.py
+"""
+Vectorized exponential-smoothing forecaster (additive Holt-Winters with a
+damped trend and weekly seasonality).
+
+Instead of an optimizer, every (alpha, beta, gamma, phi) combination in a
+small grid is filtered through the series at once: the time loop runs
+once and each step is a handful of NumPy ops over the whole grid. The
+combination with the lowest one-step-ahead squared error wins.
+"""
+import itertools
+
+import numpy as np
+
+SEASON = 7
+
+ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7)
+BETAS = (0.0, 0.01, 0.05, 0.1)
+GAMMAS = (0.05, 0.1, 0.3)
+PHIS = (0.8, 0.9, 0.98)
+
+_GRID = np.array(list(itertools.product(ALPHAS, BETAS, GAMMAS, PHIS)), dtype=float)
+
+
+def _fit(y: np.ndarray, season: int):
+    """Filter y through every grid point; returns the final states + SSE per point."""
+    alpha, beta, gamma, phi = _GRID.T
+    k = len(_GRID)
+
+    if season:
+        level0 = y[:season].mean()
+        trend0 = (y[season:2 * season].mean() - level0) / season
+        seasonal = np.tile(y[:season] - level0, (k, 1))
+        start = season
+    else:
+        level0 = y[0]
+        trend0 = y[1] - y[0]
+        seasonal = np.zeros((k, 1))
+        start = 1
+        gamma = np.zeros(k)
+
+    level = np.full(k, level0)
+    trend = np.full(k, trend0)
+    sse = np.zeros(k)
+
+    for t in range(start, len(y)):
+        slot = t % season if season else 0
+        s_prev = seasonal[:, slot]
+        damped = phi * trend
+
+        err = y[t] - (level + damped + s_prev)
+        sse += err * err
+
+        new_level = alpha * (y[t] - s_prev) + (1 - alpha) * (level + damped)
+        trend = beta * (new_level - level) + (1 - beta) * damped
+        seasonal[:, slot] = gamma * (y[t] - new_level) + (1 - gamma) * s_prev
+        level = new_level
+
+    return level, trend, seasonal, sse
+
+
+def ets_forecast(values, horizon: int = 14, season: int = SEASON):
+    """
+    Forecast `horizon` steps of a daily series.
+    Returns (preds, meta) like forecast_from_series.
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    mean = float(y.mean()) if n else 0.0
+    std = float(y.std(ddof=1)) if n > 1 and y.std(ddof=1) > 0 else 1.0
+
+    if n < 3:
+        return np.full(horizon, mean), {"mean": mean, "std": std, "trained_samples": n, "params": None}
+
+    season = season if n >= 2 * season else 0
+    level, trend, seasonal, sse = _fit(y, season)
+    best = int(np.argmin(sse))
+    alpha, beta, gamma, phi = _GRID[best]
+
+    steps = np.arange(1, horizon + 1)
+    damp_sum = np.cumsum(phi ** steps)
+    if season:
+        slots = (n - 1 + steps) % season
+        season_part = seasonal[best, slots]
+    else:
+        season_part = 0.0
+
+    preds = level[best] + damp_sum * trend[best] + season_part
+
+    return preds, {
+        "mean": mean,
+        "std": std,
+        "trained_samples": n,
+        "params": {
+            "alpha": float(alpha),
+            "beta": float(beta),
+            "gamma": float(gamma) if season else 0.0,
+            "phi": float(phi),
+            "season": season,
+        },
+        "in_sample_rmse": float(np.sqrt(sse[best] / max(1, n - (season or 1)))),
+    }
@@ -0,0 +1,85 @@
+# tf_runtime.py
+"""
+Lazy TensorFlow loader.
+
+The web tier never imports TensorFlow at module import time: /health
+answers immediately and NumPy inference runs without TF. TF is only
+needed for training (or FORECAST_INFERENCE=keras). It is loaded on
+first use or warmed in a background thread, and /ready reports its
+state.
+"""
+import os
+import time
+import threading
+from types import SimpleNamespace
+
+# 0 = let TF decide; forecast workers set small values so N processes share the CPU
+TF_INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", "0"))
+TF_INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", "0"))
+
+_lock = threading.Lock()
+_runtime = None
+_state = {"status": "cold", "error": None, "load_seconds": None}
+
+
+def load() -> SimpleNamespace:
+    """Import TF/Keras once per process and return the pieces the service uses."""
+    global _runtime
+    if _runtime is not None:
+        return _runtime
+
+    with _lock:
+        if _runtime is not None:
+            return _runtime
+
+        _state["status"] = "loading"
+        started = time.monotonic()
+        try:
+            import tensorflow as tf
+            from tensorflow.keras.models import Sequential
+            from tensorflow.keras.layers import LSTM, Dense
+            from tensorflow.keras.callbacks import EarlyStopping
+        except Exception as e:
+            _state.update(status="failed", error=str(e))
+            raise
+
+        # must happen before the first op creates the TF context
+        try:
+            if TF_INTRA_OP_THREADS:
+                tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_OP_THREADS)
+            if TF_INTER_OP_THREADS:
+                tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_OP_THREADS)
+        except RuntimeError as e:
+            print("⚠ TF thread limits not applied (context already initialized):", e)
+
+        _runtime = SimpleNamespace(
+            tf=tf,
+            Sequential=Sequential,
+            LSTM=LSTM,
+            Dense=Dense,
+            EarlyStopping=EarlyStopping,
+        )
+        _state.update(status="ready", error=None, load_seconds=round(time.monotonic() - started, 2))
+        return _runtime
+
+
+def warm_up_async():
+    """Start loading TF in the background so the first training does not pay for it."""
+    if _state["status"] != "cold":
+        return
+
+    def _warm():
+        try:
+            load()
+        except Exception as e:
+            print("⚠ TensorFlow warm-up failed:", e)
+
+    threading.Thread(target=_warm, name="tf-warmup", daemon=True).start()
+
+
+def is_ready() -> bool:
+    return _state["status"] == "ready"
+
+
+def status() -> dict:
+    return dict(_state)
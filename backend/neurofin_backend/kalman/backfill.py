@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Rebuild smoothed_balances for users from their full transaction history.
+
+Loads each user's transactions in time order, runs the forward Kalman
+filter and a Rauch–Tung–Striebel backward smoother over arrays (dt from
+the event timestamps, same noise model as the live consumer), replaces
+the user's smoothed_balances with bulk inserts and seeds the live Redis
+state with the final filtered state.
+
+Let the live kalman worker catch up, then stop it while this runs: rows
+it writes during a backfill would be deleted, and a user is skipped while
+their shard stream still has unread or pending entries (the live consumer
+would apply them a second time on top of the seeded state). --force skips
+that check.
+Usage (inside the kalman container):
+    python backfill.py --user u123 [--user u456]
+    python backfill.py --all --no-smooth
+"""
+
+import time
+import argparse
+import numpy as np
+import redis
+
+from kalman_filter import noise_scales, forward_filter, rts_smooth
+from kalman_service import (
+    r, db, smoothed_coll, smoothed_doc, set_kalman_state, event_epoch, shard_of,
+    MIN_DT, STREAM_PREFIX, GROUP,
+)
+
+INSERT_CHUNK = 10000
+
+
+def load_history(user_id):
+    """(as_of datetimes, event epochs, signed amounts) in time order."""
+    cursor = db["transactions"].find(
+        {"user_id": user_id},
+        {"_id": 0, "ts": 1, "amount": 1, "direction": 1},
+        batch_size=INSERT_CHUNK,
+    ).sort("ts", 1)
+    rows = [t for t in cursor if t.get("ts") is not None]
+    if not rows:
+        return [], np.array([]), np.array([])
+
+    as_of = [t["ts"] for t in rows]
+    times = np.array([event_epoch(ts) for ts in as_of], dtype=float)
+    amount = np.array([float(t.get("amount") or 0.0) for t in rows])
+    debit = np.array([t.get("direction") == "debit" for t in rows])
+    return as_of, times, np.where(debit, -amount, amount)
+
+
+def shard_drained(user_id):
+    """True when the live consumer has read and acked everything on the user's shard stream."""
+    stream = f"{STREAM_PREFIX}{shard_of(user_id)}"
+    try:
+        last_id = r.xinfo_stream(stream)["last-generated-id"]
+        group = next((g for g in r.xinfo_groups(stream) if g["name"] == GROUP), None)
+    except redis.ResponseError:         # no stream yet → nothing in flight
+        return True
+    if group is None:
+        return False                    # entries nobody has consumed
+    return group["pending"] == 0 and group["last-delivered-id"] == last_id
+
+
+def backfill_user(user_id, smooth=True, seed_state=True, force=False):
+    """Number of points written, or None when skipped because the shard is not drained."""
+    if not force and not shard_drained(user_id):
+        return None
+
+    as_of, times, z = load_history(user_id)
+    if not len(z):
+        return 0
+
+    dt = np.empty(len(z))
+    dt[0] = 1.0
+    dt[1:] = np.maximum(MIN_DT, np.diff(times) / 86400.0)
+    q, r = noise_scales(z)
+
+    x_pred, P_pred, x_filt, P_filt = forward_filter(z, dt, q, r)
+    x_out, P_out = rts_smooth(x_pred, P_pred, x_filt, P_filt, dt) if smooth else (x_filt, P_filt)
+
+    method = "rts" if smooth else "filter"
+    docs = []
+    for ts, b, v in zip(as_of, x_out[:, 0].tolist(), P_out[:, 0, 0].tolist()):
+        doc = smoothed_doc(user_id, ts, b, v)
+        doc["method"] = method
+        docs.append(doc)
+
+    smoothed_coll.delete_many({"user_id": user_id})
+    for i in range(0, len(docs), INSERT_CHUNK):
+        smoothed_coll.insert_many(docs[i:i + INSERT_CHUNK], ordered=False)
+
+    if seed_state:
+        # live filtering continues from the last *filtered* (not smoothed) state
+        set_kalman_state(user_id, (*x_filt[-1], *P_filt[-1].ravel()), times[-1])
+    return len(docs)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--user", action="append", default=[], help="User id (repeatable)")
+    p.add_argument("--all", action="store_true", help="Every user with transactions")
+    p.add_argument("--no-smooth", action="store_true", help="Forward filter only (what the live consumer writes)")
+    p.add_argument("--no-state", action="store_true", help="Do not overwrite the live Redis state")
+    p.add_argument("--force", action="store_true", help="Run even if the user's shard stream is not drained")
+    args = p.parse_args()
+
+    users = db["transactions"].distinct("user_id") if args.all else args.user
+    if not users:
+        p.error("pass --user or --all")
+
+    for user_id in users:
+        t0 = time.perf_counter()
+        n = backfill_user(user_id, smooth=not args.no_smooth, seed_state=not args.no_state, force=args.force)
+        if n is None:
+            print(f"⚠ [backfill] {user_id}: skipped, shard stream has unprocessed entries (pause the kalman worker or wait)")
+            continue
+        print(f"[backfill] {user_id}: {n} points in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
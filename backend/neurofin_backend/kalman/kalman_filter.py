@@ -0,0 +1,151 @@
+# kalman_filter.py
+"""
+Constant-velocity Kalman filter for balances: state (balance, velocity),
+scalar observation of the balance, A = [[1, dt], [0, 1]], H = [1, 0],
+Q = q·I, R = r.
+
+kalman_update is the generic matrix form (reference). kalman_update_scalar
+is the same update written out as float arithmetic for one event, and
+kalman_update_batch advances many users at once over (n, 2) / (n, 2, 2)
+arrays. forward_filter + rts_smooth run a whole history offline.
+State tuples are (b, v, p00, p01, p10, p11).
+"""
+import numpy as np
+
+INITIAL_STATE = (0.0, 0.0, 1e6, 0.0, 0.0, 1e6)
+
+
+def noise_scales(signed_amt):
+    """(Q_scale, R_scale) for an event; larger amounts → noisier (works on arrays too)."""
+    a = np.abs(signed_amt)
+    return np.maximum(1.0, a * 0.1 + 1.0), np.maximum(1.0, a * 0.5 + 1.0)
+
+
+def kalman_update(x_prev, P_prev, z, dt=1.0, Q_scale=1.0, R_scale=1.0):
+    A = np.array([[1.0, dt],[0.0, 1.0]])
+    H = np.array([[1.0, 0.0]])
+    Q = np.eye(2) * Q_scale
+    R = np.array([[R_scale]])
+    x_pred = A.dot(x_prev)
+    P_pred = A.dot(P_prev).dot(A.T) + Q
+    S = H.dot(P_pred).dot(H.T) + R
+    K = P_pred.dot(H.T).dot(np.linalg.inv(S))
+    y = np.array([[z]]) - H.dot(x_pred)
+    x_new = x_pred + K.dot(y)
+    P_new = (np.eye(2) - K.dot(H)).dot(P_pred)
+    return x_new, P_new
+
+
+def predict_scalar(state, dt=1.0, q=1.0):
+    b, v, p00, p01, p10, p11 = state
+    return (
+        b + dt * v,
+        v,
+        p00 + dt * (p01 + p10) + dt * dt * p11 + q,
+        p01 + dt * p11,
+        p10 + dt * p11,
+        p11 + q,
+    )
+
+
+def correct_scalar(pred, z, r=1.0):
+    # S is 1x1, so K = P_pred·Hᵀ / S
+    b, v, pp00, pp01, pp10, pp11 = pred
+    s = pp00 + r
+    k0 = pp00 / s
+    k1 = pp10 / s
+    y = z - b
+    return (
+        b + k0 * y,
+        v + k1 * y,
+        (1.0 - k0) * pp00,
+        (1.0 - k0) * pp01,
+        pp10 - k1 * pp00,
+        pp11 - k1 * pp01,
+    )
+
+
+def kalman_update_scalar(state, z, dt=1.0, q=1.0, r=1.0):
+    """kalman_update on a state tuple with plain floats (no arrays, no inverse)."""
+    return correct_scalar(predict_scalar(state, dt, q), z, r)
+
+
+def kalman_update_batch(x, P, z, dt, q, r):
+    """
+    One update for n users at once.
+    x: (n, 2), P: (n, 2, 2), z / dt / q / r: (n,) → (x_new, P_new)
+    """
+    b = x[:, 0] + dt * x[:, 1]
+    p00, p01, p10, p11 = P[:, 0, 0], P[:, 0, 1], P[:, 1, 0], P[:, 1, 1]
+
+    pp00 = p00 + dt * (p01 + p10) + dt * dt * p11 + q
+    pp01 = p01 + dt * p11
+    pp10 = p10 + dt * p11
+    pp11 = p11 + q
+
+    s = pp00 + r
+    k0 = pp00 / s
+    k1 = pp10 / s
+    y = z - b
+
+    x_new = np.empty_like(x)
+    x_new[:, 0] = b + k0 * y
+    x_new[:, 1] = x[:, 1] + k1 * y
+
+    P_new = np.empty_like(P)
+    P_new[:, 0, 0] = (1.0 - k0) * pp00
+    P_new[:, 0, 1] = (1.0 - k0) * pp01
+    P_new[:, 1, 0] = pp10 - k1 * pp00
+    P_new[:, 1, 1] = pp11 - k1 * pp01
+    return x_new, P_new
+
+
+def forward_filter(z, dt, q, r, state=INITIAL_STATE):
+    """
+    Filter one user's whole history.
+    z / dt / q / r: (n,) → (x_pred, P_pred, x_filt, P_filt) as (n, 2) / (n, 2, 2).
+    """
+    n = len(z)
+    pred = np.empty((n, 6))
+    filt = np.empty((n, 6))
+    for k, (zk, dtk, qk, rk) in enumerate(zip(z.tolist(), dt.tolist(), q.tolist(), r.tolist())):
+        p = predict_scalar(state, dtk, qk)
+        state = correct_scalar(p, zk, rk)
+        pred[k] = p
+        filt[k] = state
+    return pred[:, :2], pred[:, 2:].reshape(n, 2, 2), filt[:, :2], filt[:, 2:].reshape(n, 2, 2)
+
+
+def rts_smooth(x_pred, P_pred, x_filt, P_filt, dt):
+    """
+    Rauch–Tung–Striebel backward pass over forward_filter output.
+    Returns (x_smooth (n, 2), P_smooth (n, 2, 2)).
+    """
+    n = len(x_filt)
+    xs = x_filt.copy()
+    Ps = P_filt.copy()
+    if n < 2:
+        return xs, Ps
+
+    # all smoother gains at once: C_k = P_filt_k · A_{k+1}ᵀ · P_pred_{k+1}⁻¹
+    At = np.zeros((n - 1, 2, 2))
+    At[:, 0, 0] = At[:, 1, 1] = 1.0
+    At[:, 1, 0] = dt[1:]
+    C = P_filt[:-1] @ At @ np.linalg.inv(P_pred[1:])
+
+    for k in range(n - 2, -1, -1):
+        Ck = C[k]
+        xs[k] = x_filt[k] + Ck @ (xs[k + 1] - x_pred[k + 1])
+        Ps[k] = P_filt[k] + Ck @ (Ps[k + 1] - P_pred[k + 1]) @ Ck.T
+    return xs, Ps
+
+
+def state_to_arrays(state):
+    b, v, p00, p01, p10, p11 = state
+    return np.array([[b], [v]]), np.array([[p00, p01], [p10, p11]])
+
+
+def arrays_to_state(x, P):
+    x = np.asarray(x, dtype=float).ravel()
+    P = np.asarray(P, dtype=float).ravel()
+    return (float(x[0]), float(x[1]), float(P[0]), float(P[1]), float(P[2]), float(P[3]))
@@ -2,12 +2,19 @@
 import os
 import time
 import json
+import struct
+import hashlib
 import numpy as np
 import redis
 from pymongo import MongoClient
-from datetime import datetime
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
+from kalman_filter import (
+    INITIAL_STATE, noise_scales, kalman_update_batch, arrays_to_state,
+)
+
 load_dotenv()
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
@@ -16,92 +23,337 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB = os.getenv("MONGO_DB", "neurofin")
 
 r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+r_state = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)      # raw bytes for the packed states
 mongo = MongoClient(MONGO_URI)
 db = mongo[MONGO_DB]
 smoothed_coll = db["smoothed_balances"]
 
-def kalman_update(x_prev, P_prev, z, dt=1.0, Q_scale=1.0, R_scale=1.0):
-    A = np.array([[1.0, dt],[0.0, 1.0]])
-    H = np.array([[1.0, 0.0]])
-    Q = np.eye(2) * Q_scale
-    R = np.array([[R_scale]])
-    x_pred = A.dot(x_prev)
-    P_pred = A.dot(P_prev).dot(A.T) + Q
-    S = H.dot(P_pred).dot(H.T) + R
-    K = P_pred.dot(H.T).dot(np.linalg.inv(S))
-    y = np.array([[z]]) - H.dot(x_pred)
-    x_new = x_pred + K.dot(y)
-    P_new = (np.eye(2) - K.dot(H)).dot(P_pred)
-    return x_new, P_new
-
-def get_kalman_state(user_id):
-    key = f"kalman:{user_id}"
-    raw = r.get(key)
-    if raw:
-        obj = json.loads(raw)
-        x = np.array(obj["x"])
-        P = np.array(obj["P"])
-        ts = obj.get("ts")
-        return x, P, ts
-    else:
-        x = np.array([[0.0],[0.0]])
-        P = np.eye(2) * 1e6
-        return x, P, None
-
-def set_kalman_state(user_id, x, P):
-    key = f"kalman:{user_id}"
-    obj = {
-        "x": x.tolist(),
-        "P": P.tolist(),
-        "ts": datetime.utcnow().isoformat()
-    }
-    r.set(key, json.dumps(obj))
+QUEUE_KEY = "transactions_queue"                                   # legacy list queue
+BATCH_SIZE = int(os.getenv("KALMAN_BATCH_SIZE", "500"))      # max events drained per wake-up
+POP_TIMEOUT = int(os.getenv("KALMAN_POP_TIMEOUT", "5"))
+
+# -------------------------------------------------------
+# SHARDED STREAMS
+# transactions_stream:{shard}, shard = md5(user_id)[:8] % KALMAN_SHARDS
+# (same rule as api/src/routes/transactions.ts). Worker i of N owns the
+# shards with shard % N == i, so a user's events always reach one consumer.
+# -------------------------------------------------------
+STREAM_PREFIX = "transactions_stream:"
+GROUP = "kalman"
+SHARDS = int(os.getenv("KALMAN_SHARDS", "8"))
+WORKERS = int(os.getenv("KALMAN_WORKERS", "1"))
+WORKER_INDEX = int(os.getenv("KALMAN_WORKER_INDEX", "0"))
+CONSUMER = os.getenv("KALMAN_CONSUMER", f"kalman-{WORKER_INDEX}")
+CLAIM_IDLE_MS = int(os.getenv("KALMAN_CLAIM_IDLE_MS", "60000"))     # pending this long → reclaim
+CLAIM_INTERVAL = float(os.getenv("KALMAN_CLAIM_INTERVAL", "30"))
+MAX_DELIVERIES = int(os.getenv("KALMAN_MAX_DELIVERIES", "5"))      # then → {stream}:dead
+DEAD_LETTER_SUFFIX = ":dead"
+# 1 only while old producers may still RPUSH to transactions_queue
+# (drained with LPOP from the head, so events keep their FIFO order)
+LEGACY_QUEUE = os.getenv("KALMAN_LEGACY_QUEUE", "0") in ("1", "true", "yes")
+MIN_DT = float(os.getenv("KALMAN_MIN_DT", "1.0"))      # days; floor for the step between events
+
+def shard_of(user_id: str) -> int:
+    return int(hashlib.md5(str(user_id).encode("utf-8")).hexdigest()[:8], 16) % SHARDS
+
+def owned_streams():
+    return [f"{STREAM_PREFIX}{s}" for s in range(SHARDS) if s % WORKERS == WORKER_INDEX]
+
+# -------------------------------------------------------
+# STATE ENCODING
+# kalman:{user_id} = 7 little-endian doubles (56 bytes):
+# b, v, p00, p01, p10, p11, last event time (epoch seconds).
+# Legacy JSON values ({"x": [[b],[v]], "P": [[..],[..]], "ts": iso}) are
+# still read and are rewritten packed on the user's next event.
+# -------------------------------------------------------
+STATE_STRUCT = struct.Struct("<7d")
+
+def _decode_state(raw):
+    """(state tuple, last event epoch) from a packed or legacy JSON value, or the initial state."""
+    if not raw:
+        return INITIAL_STATE, None
+    if len(raw) == STATE_STRUCT.size:          # legacy JSON is always longer
+        *state, event_time = STATE_STRUCT.unpack(raw)
+        return tuple(state), event_time
+
+    obj = json.loads(raw)
+    return arrays_to_state(obj["x"], obj["P"]), event_epoch(obj.get("ts"))
+
+def _encode_state(state, event_time):
+    return STATE_STRUCT.pack(*(float(v) for v in state), float(event_time))
+
+def get_kalman_states(user_ids):
+    """{ user_id: (state, last event epoch) } for many users in one MGET."""
+    raws = r_state.mget([f"kalman:{u}" for u in user_ids]) if user_ids else []
+    return {u: _decode_state(raw) for u, raw in zip(user_ids, raws)}
 
-def write_smoothed_balance(user_id, as_of, smoothed_balance, var):
+def set_kalman_state(user_id, state, event_time, pipe=None):
+    (pipe or r_state).set(f"kalman:{user_id}", _encode_state(state, event_time))
+
+def smoothed_doc(user_id, as_of, smoothed_balance, var, event_id=None):
     doc = {
         "user_id": user_id,
-        "as_of": datetime.fromisoformat(as_of) if isinstance(as_of, str) else as_of,
+        "as_of": parse_ts(as_of) if isinstance(as_of, str) else as_of,
         "smoothed_balance": smoothed_balance,
         "var": var,
         "created_at": datetime.utcnow()
     }
-    smoothed_coll.insert_one(doc)
+    if event_id is not None:
+        doc["event_id"] = event_id      # unique → replayed stream entries are not stored twice
+    return doc
+
+def parse_event(payload):
+    """
+    (user_id, ts, signed_amount) from a queue payload (JSON) or stream entry fields.
+    Raises on anything malformed (bad ts included), so callers skip just that event.
+    """
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    amount = float(payload["amount"])
+    signed_amt = -amount if payload["direction"] == "debit" else amount
+    ts = payload["ts"]
+    if parse_ts(ts) is None:
+        raise ValueError(f"unparseable ts {ts!r}")
+    return payload["user_id"], ts, signed_amt
 
-print("Kalman service starting... connecting to Redis and MongoDB")
-while True:
+def parse_ts(ts):
+    """datetime from an ISO timestamp (or datetime); None when missing or unparseable."""
+    if isinstance(ts, datetime):
+        return ts
     try:
-        item = r.brpop("transactions_queue", timeout=5)
-        if item is None:
-            continue
-        _, payload_json = item
-        payload = json.loads(payload_json)
-        user_id = payload["user_id"]
-        ts = payload["ts"]
-        amount = float(payload["amount"])
-        dir = payload["direction"]
-        signed_amt = -amount if dir == "debit" else amount
-
-        x_prev, P_prev, prev_ts = get_kalman_state(user_id)
-        dt = 1.0
-        if prev_ts:
-            try:
-                prev_dt = datetime.fromisoformat(prev_ts)
-                cur_dt = datetime.utcnow()
-                dt = max(1.0, (cur_dt - prev_dt).total_seconds() / 86400.0)
-            except Exception:
-                dt = 1.0
-
-        z = signed_amt
-        Q_scale = max(1.0, abs(signed_amt) * 0.1 + 1.0)
-        R_scale = max(1.0, abs(signed_amt) * 0.5 + 1.0)
-
-        x_new, P_new = kalman_update(x_prev, P_prev, z, dt=dt, Q_scale=Q_scale, R_scale=R_scale)
-        set_kalman_state(user_id, x_new, P_new)
-        smoothed_balance = float(x_new[0][0])
-        var = float(P_new[0][0])
-        write_smoothed_balance(user_id, ts, smoothed_balance, var)
-        print(f"Processed tx for user {user_id} ts={ts} amt={signed_amt} smoothed={smoothed_balance:.2f}")
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+
+def event_epoch(ts):
+    """Epoch seconds of an ISO timestamp (naive = UTC); None when missing or unparseable."""
+    dt = parse_ts(ts)
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def days_between(prev_time, cur_time):
+    """dt in days between two event times, at least KALMAN_MIN_DT (works on arrays too)."""
+    return np.maximum(MIN_DT, (cur_time - prev_time) / 86400.0)
+
+# -------------------------------------------------------
+# BATCH APPLY
+# -------------------------------------------------------
+def apply_events(events, stream=None, ack_ids=()):
+    """
+    Apply (user_id, ts, signed_amount, event_id) events: grouped by user,
+    in arrival order per user; one MGET for the states, one insert_many,
+    one pipeline for the writes. The filter runs in rounds — round k
+    applies every user's k-th event in one vectorized update.
+    With a stream, the state writes and the XACK commit in one MULTI.
+    Returns the number of events applied.
+    """
+    by_user = {}
+    for user_id, ts, signed_amt, event_id in events:
+        by_user.setdefault(user_id, []).append((ts, signed_amt, event_id))
+
+    docs = []
+    pipe = r_state.pipeline(transaction=stream is not None)
+    if by_user:
+        # busiest users first, so the users still active in round k are a prefix
+        users = sorted(by_user, key=lambda u: len(by_user[u]), reverse=True)
+        counts = np.array([len(by_user[u]) for u in users])
+        Z = np.zeros((len(users), counts[0]))
+        T = np.zeros((len(users), counts[0]))          # event times (epoch s)
+        for i, u in enumerate(users):
+            Z[i, :counts[i]] = [amt for _, amt, _ in by_user[u]]
+            T[i, :counts[i]] = [event_epoch(ts) for ts, _, _ in by_user[u]]     # validated by parse_event
+
+        states = get_kalman_states(users)
+        X = np.array([states[u][0][:2] for u in users])
+        P = np.array([states[u][0][2:] for u in users]).reshape(-1, 2, 2)
+        prev = np.array([states[u][1] if states[u][1] is not None else np.nan for u in users])
+        last_time = T[np.arange(len(users)), counts - 1]
+
+        for k in range(counts[0]):
+            m = int((counts > k).sum())
+            z = Z[:m, k]
+            q, r_ = noise_scales(z)
+            # dt from the event timestamps; a user's first-ever event uses one day
+            dt = days_between(prev[:m], T[:m, k])
+            dt[np.isnan(dt)] = 1.0
+            X[:m], P[:m] = kalman_update_batch(X[:m], P[:m], z, dt, q, r_)
+            prev[:m] = T[:m, k]
+            for i in range(m):
+                ts, _, event_id = by_user[users[i]][k]
+                docs.append(smoothed_doc(users[i], ts, float(X[i, 0]), float(P[i, 0, 0]), event_id))
 
+        for i, u in enumerate(users):
+            set_kalman_state(u, (*X[i], *P[i].ravel()), last_time[i], pipe=pipe)
+
+    # Mongo first: if we die before the ack, the entries are replayed and
+    # the duplicate event_ids are rejected by the unique index
+    if docs:
+        try:
+            smoothed_coll.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+    if stream is not None and ack_ids:
+        pipe.xack(stream, GROUP, *ack_ids)
+    pipe.execute()
+    return len(docs)
+
+# -------------------------------------------------------
+# STREAM CONSUMER
+# -------------------------------------------------------
+def ensure_groups(streams):
+    for stream in streams:
+        try:
+            r.xgroup_create(stream, GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    try:
+        smoothed_coll.create_index("event_id", unique=True, sparse=True)
     except Exception as e:
-        print("Kalman service error:", e)
-        time.sleep(1)
+        print("⚠ Index creation failed:", e)
+
+def handle_entries(stream, entries):
+    """Parse + apply one stream's entries and ack them (malformed ones too)."""
+    events, ids = [], []
+    for entry_id, fields in entries:
+        ids.append(entry_id)
+        if not fields:                     # deleted while pending
+            continue
+        try:
+            events.append((*parse_event(fields), f"{stream}/{entry_id}"))
+        except Exception as e:
+            print("⚠ Skipping malformed event:", entry_id, e)
+    return apply_events(events, stream=stream, ack_ids=ids)
+
+def replay_own_pending(streams):
+    """Entries delivered to this consumer name but never acked (previous run crashed)."""
+    for stream in streams:
+        try:
+            while True:
+                resp = r.xreadgroup(GROUP, CONSUMER, {stream: "0"}, count=BATCH_SIZE)
+                entries = resp[0][1] if resp else []
+                if not entries:
+                    break
+                handle_entries(stream, entries)
+        except Exception as e:
+            print("⚠ Replay failed on", stream, e)      # left pending for reclaim_idle
+
+def dead_letter(stream):
+    """
+    Move entries delivered MAX_DELIVERIES times without an ack (they keep
+    failing) to {stream}:dead and ack them, so the shard is not stuck on them.
+    """
+    pending = r.xpending_range(stream, GROUP, "-", "+", BATCH_SIZE, idle=CLAIM_IDLE_MS)
+    ids = [p["message_id"] for p in pending if p["times_delivered"] >= MAX_DELIVERIES]
+    if not ids:
+        return 0
+
+    pipe = r.pipeline(transaction=True)
+    for entry_id in ids:
+        for _, fields in r.xrange(stream, entry_id, entry_id):
+            pipe.xadd(stream + DEAD_LETTER_SUFFIX, {**fields, "source_id": entry_id})
+    pipe.xack(stream, GROUP, *ids)
+    pipe.execute()
+    print(f"⚠ Dead-lettered {len(ids)} entries from {stream} after {MAX_DELIVERIES} deliveries")
+    return len(ids)
+
+def reclaim_idle(streams):
+    """
+    Take over entries left pending on our shards (a dead consumer, or a
+    batch of ours that failed). Returns the streams that still hold pending
+    entries — they are not read until reclaimed, so a user's older events
+    are never applied after newer ones. Errors stay local to their stream.
+    """
+    blocked = set()
+    for stream in streams:
+        try:
+            dead_letter(stream)
+            start = "0-0"
+            while True:
+                resp = r.xautoclaim(stream, GROUP, CONSUMER, CLAIM_IDLE_MS, start_id=start, count=BATCH_SIZE)
+                start, entries = resp[0], resp[1]
+                if entries:
+                    print(f"Reclaimed {len(entries)} pending entries on {stream}")
+                    handle_entries(stream, entries)
+                if start in ("0-0", b"0-0") or not entries:
+                    break
+
+            if r.xpending(stream, GROUP).get("pending"):
+                blocked.add(stream)
+        except Exception as e:
+            print("⚠ Reclaim failed on", stream, e)
+            blocked.add(stream)
+    return blocked
+
+def consume_streams(streams, blocked):
+    """Read new entries; a stream whose batch fails is added to blocked until reclaimed."""
+    resp = r.xreadgroup(GROUP, CONSUMER, {s: ">" for s in streams}, count=BATCH_SIZE, block=POP_TIMEOUT * 1000)
+    applied = 0
+    for stream, entries in resp or []:
+        try:
+            applied += handle_entries(stream, entries)
+        except Exception as e:
+            print("⚠ Batch failed on", stream, e)
+            blocked.add(stream)
+    return applied
+
+def drain_legacy_queue():
+    """
+    Worker 0 moves events from the old list queue onto their shard streams,
+    so each is applied by the worker that owns the user (no cross-worker
+    writes to kalman:{user_id}). Producers RPUSH, so popping from the head
+    moves the oldest events first. Returns the number moved.
+    """
+    payloads = r.lpop(QUEUE_KEY, BATCH_SIZE) or []
+    pipe = r.pipeline(transaction=False)
+    moved = 0
+    for raw in payloads:
+        try:
+            fields = json.loads(raw)
+            parse_event(fields)
+        except Exception as e:
+            print("⚠ Skipping malformed event:", e)
+            continue
+        fields = {k: v for k, v in fields.items() if v is not None}
+        pipe.xadd(f"{STREAM_PREFIX}{shard_of(fields['user_id'])}", fields)
+        moved += 1
+    if moved:
+        pipe.execute()
+    return moved
+
+def main():
+    streams = owned_streams()
+    print(f"Kalman service starting... worker {WORKER_INDEX}/{WORKERS} ({CONSUMER}) owns {len(streams)} of {SHARDS} shards")
+    ensure_groups(streams)
+    replay_own_pending(streams)
+    blocked = set(streams)
+    last_claim = 0.0
+
+    while True:
+        try:
+            # shards with pending entries are re-checked every second
+            interval = 1.0 if blocked else CLAIM_INTERVAL
+            if time.monotonic() - last_claim > interval:
+                last_claim = time.monotonic()
+                blocked = reclaim_idle(streams)
+
+            started = time.monotonic()
+            readable = [s for s in streams if s not in blocked]
+            applied = consume_streams(readable, blocked) if readable else 0
+            if not readable:
+                time.sleep(1)
+            if LEGACY_QUEUE and WORKER_INDEX == 0:
+                drain_legacy_queue()
+            if applied:
+                print(f"Processed {applied} tx in {1000 * (time.monotonic() - started):.1f}ms")
+
+        except Exception as e:
+            print("Kalman service error:", e)
+            time.sleep(1)
+
+if __name__ == "__main__":
+    main()
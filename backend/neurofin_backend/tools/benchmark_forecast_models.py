@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Backtest the forecast engines on synthetic daily net-flow histories.
+
+For each synthetic user the last --horizon days are held out; every engine
+is fit on the rest and scored by MAE on the held-out days. Latency covers
+fit + predict. Engines: ets-v1 (stat_models), lstm-v1 (forecast_service,
+skipped when tensorflow is missing) and a seasonal-naive baseline.
+Usage:
+    python tools/benchmark_forecast_models.py --users 50 --horizon 14
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "forecast"))
+
+from stat_models import ets_forecast  # noqa: E402
+
+
+def synthetic_history(rng, days):
+    """Weekly spending rhythm + slow drift + noise, salary on day 1 of each month."""
+    t = np.arange(days)
+    base = -rng.uniform(300, 2500)
+    weekly = rng.uniform(100, 900) * np.sin(2 * np.pi * (t + rng.integers(7)) / 7)
+    drift = rng.uniform(-3, 3) * t
+    noise = rng.normal(0, rng.uniform(50, 400), days)
+    values = base + weekly + drift + noise
+
+    index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=days, freq="D")
+    values[index.day == 1] += rng.uniform(20000, 80000)
+    values[rng.random(days) < 0.1] = 0.0          # quiet days
+    return pd.Series(values, index=index)
+
+
+def seasonal_naive(series, horizon):
+    last_week = series.values[-7:]
+    return np.resize(last_week, horizon)
+
+
+def ets_engine(series, horizon):
+    return ets_forecast(series.values, horizon=horizon)[0]
+
+
+def load_lstm_engine(epochs):
+    try:
+        from forecast_service import train_model, predict_horizon
+    except ImportError as e:
+        print(f"[bench] lstm-v1 skipped ({e})")
+        return None
+
+    def lstm_engine(series, horizon):
+        model, meta = train_model(series, seq_len=14, epochs=epochs)
+        return predict_horizon(model, series, meta, horizon=horizon)
+
+    return lstm_engine
+
+
+def run(engines, histories, horizon):
+    rows = []
+    for name, fn in engines.items():
+        maes, latencies = [], []
+        for series in histories:
+            train, test = series[:-horizon], series.values[-horizon:]
+            t0 = time.perf_counter()
+            preds = fn(train, horizon)
+            latencies.append(time.perf_counter() - t0)
+            maes.append(float(np.mean(np.abs(np.asarray(preds) - test))))
+        rows.append({
+            "engine": name,
+            "mae": np.mean(maes),
+            "median_mae": np.median(maes),
+            "latency_ms": 1000 * np.mean(latencies),
+            "p95_ms": 1000 * np.percentile(latencies, 95),
+        })
+    return pd.DataFrame(rows).set_index("engine")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--users", type=int, default=50, help="Number of synthetic histories")
+    p.add_argument("--min-days", type=int, default=60)
+    p.add_argument("--max-days", type=int, default=365)
+    p.add_argument("--horizon", type=int, default=14)
+    p.add_argument("--epochs", type=int, default=10, help="LSTM epochs (lstm-v1 default)")
+    p.add_argument("--no-lstm", action="store_true", help="Skip the TensorFlow model")
+    p.add_argument("--seed", type=int, default=42)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    histories = [
+        synthetic_history(rng, int(rng.integers(args.min_days, args.max_days + 1)))
+        for _ in range(args.users)
+    ]
+
+    engines = {"seasonal-naive": seasonal_naive, "ets-v1": ets_engine}
+    if not args.no_lstm:
+        lstm = load_lstm_engine(args.epochs)
+        if lstm is not None:
+            engines["lstm-v1"] = lstm
+
+    print(f"[bench] {args.users} users, {args.min_days}-{args.max_days} days, horizon {args.horizon}")
+    print(run(engines, histories, args.horizon).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
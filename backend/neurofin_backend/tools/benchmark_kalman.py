@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-event cost of the Kalman balance update.
+
+Runs the same synthetic event streams through the matrix reference
+(kalman_update), the float-only update (kalman_update_scalar) and the
+multi-user update (kalman_update_batch), checks they agree and prints
+microseconds per event.
+Usage:
+    python tools/benchmark_kalman.py --users 1000 --events 50
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "kalman"))
+
+from kalman_filter import (  # noqa: E402
+    INITIAL_STATE, noise_scales, kalman_update, kalman_update_scalar, kalman_update_batch,
+    state_to_arrays, arrays_to_state,
+)
+
+
+def run_reference(Z, dt):
+    out = []
+    for zs in Z:
+        x, P = state_to_arrays(INITIAL_STATE)
+        for z in zs:
+            q, r = noise_scales(z)
+            x, P = kalman_update(x, P, z, dt=dt, Q_scale=q, R_scale=r)
+        out.append(arrays_to_state(x, P))
+    return np.array(out)
+
+
+def run_scalar(Z, dt):
+    out = []
+    for zs in Z.tolist():
+        state = INITIAL_STATE
+        for z in zs:
+            q = max(1.0, abs(z) * 0.1 + 1.0)
+            r = max(1.0, abs(z) * 0.5 + 1.0)
+            state = kalman_update_scalar(state, z, dt=dt, q=q, r=r)
+        out.append(state)
+    return np.array(out)
+
+
+def run_batch(Z, dt):
+    n = len(Z)
+    X = np.zeros((n, 2))
+    P = np.tile(np.array(state_to_arrays(INITIAL_STATE)[1]), (n, 1, 1))
+    for k in range(Z.shape[1]):
+        q, r = noise_scales(Z[:, k])
+        X, P = kalman_update_batch(X, P, Z[:, k], dt, q, r)
+    return np.concatenate([X, P.reshape(n, 4)], axis=1)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--events", type=int, default=50, help="Events per user")
+    p.add_argument("--dt", type=float, default=1.0, help="Days between events")
+    p.add_argument("--seed", type=int, default=42)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    Z = -rng.lognormal(6, 1.2, (args.users, args.events))
+    Z[rng.random(Z.shape) < 0.05] *= -20                  # occasional credits
+    n_events = Z.size
+
+    ref, t_ref = timed(run_reference, Z, args.dt)
+    scalar, t_scalar = timed(run_scalar, Z, args.dt)
+    batch, t_batch = timed(run_batch, Z, args.dt)
+
+    print(f"[bench] {args.users} users x {args.events} events")
+    for name, out, t in (("reference", ref, t_ref), ("scalar", scalar, t_scalar), ("batch", batch, t_batch)):
+        rel = float(np.max(np.abs(out - ref) / np.maximum(1.0, np.abs(ref))))
+        print(f"  {name:10s} {1e6 * t / n_events:8.2f} us/event  speedup x{t_ref / t:6.1f}  max_rel_diff={rel:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Check that the NumPy LSTM rollout matches the Keras predict-per-step loop.
+
+Trains a small forecast model on a synthetic daily series, then compares
+both inference paths and prints the max absolute difference and timings.
+Usage (needs tensorflow, i.e. inside the forecast image):
+    python tools/check_lstm_rollout.py --days 180 --horizon 14 90
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "forecast"))
+
+from forecast_service import train_model, predict_horizon  # noqa: E402
+
+
+def synthetic_series(days, seed=7):
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)
+    values = 400 * np.sin(2 * np.pi * t / 7) - 150 + rng.normal(0, 120, days)
+    values[::30] += 30000          # salary credits
+    return pd.Series(values, index=pd.date_range(end=pd.Timestamp.today().normalize(), periods=days, freq="D"))
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--days", type=int, default=180, help="Length of the synthetic history")
+    p.add_argument("--horizon", type=int, nargs="+", default=[14, 90], help="Horizons to compare")
+    p.add_argument("--atol", type=float, default=1e-3, help="Allowed max abs diff (normalized units)")
+    args = p.parse_args()
+
+    series = synthetic_series(args.days)
+    model, meta = train_model(series, seq_len=14, epochs=5)
+
+    ok = True
+    for horizon in args.horizon:
+        t0 = time.perf_counter()
+        ref = predict_horizon(model, series, meta, horizon=horizon, engine="keras")
+        t1 = time.perf_counter()
+        fast = predict_horizon(model, series, meta, horizon=horizon, engine="numpy")
+        t2 = time.perf_counter()
+
+        diff = float(np.max(np.abs(ref - fast)) / meta["std"])
+        ok &= diff <= args.atol
+        print(f"[check] horizon={horizon:3d} max_abs_diff={diff:.2e} "
+              f"keras={1000 * (t1 - t0):8.1f}ms numpy={1000 * (t2 - t1):6.1f}ms")
+
+    print("[check] OK" if ok else "[check] MISMATCH")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()